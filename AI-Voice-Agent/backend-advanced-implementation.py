@@ -4,23 +4,24 @@
 
 ```python
 # app/api/v1/endpoints/customers.py
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from typing import List, Optional
 import csv
 import io
 from app.schemas.customer import Customer, CustomerCreate, CustomerUpdate
+from app.db.pagination import Page
 from app.services.customer import create_customer, get_customers, update_customer
 from app.api.deps import get_current_user
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Customer])
+@router.get("/", response_model=Page[Customer])
 async def list_customers(
     current_user = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: Optional[str] = None
 ):
-    return await get_customers(skip=skip, limit=limit)
+    return await get_customers(limit=limit, cursor=cursor)
 
 @router.post("/", response_model=Customer)
 async def create_new_customer(
@@ -61,15 +62,28 @@ async def update_customer_info(
     current_user = Depends(get_current_user)
 ):
     return await update_customer(customer_id, customer)
+
+# app/services/customer.py (continued)
+import asyncio
+from typing import Dict, Optional
+from app.db.base import db
+from app.db.pagination import Page, paginate
+
+async def get_customers(limit: int = 100, cursor: Optional[str] = None) -> Page[Dict]:
+    """Customers, newest first"""
+    return await asyncio.to_thread(
+        paginate, db.collection('customers'), order_field='created_at', limit=limit, cursor=cursor
+    )
 ```
 
 2. Calls management endpoints:
 
 ```python
 # app/api/v1/endpoints/calls.py
-from fastapi import APIRouter, Depends, HTTPException, WebSocket
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, Query
+from typing import List, Optional
 from app.schemas.call import Call, CallCreate, CallUpdate, CallStatus
+from app.db.pagination import Page
 from app.services.call import create_call, get_calls, update_call_status
 from app.api.deps import get_current_user
 
@@ -82,15 +96,15 @@ async def create_new_call(
 ):
     return await create_call(call)
 
-@router.get("/", response_model=List[Call])
+@router.get("/", response_model=Page[Call])
 async def list_calls(
     current_user = Depends(get_current_user),
     campaign_id: str = None,
     status: CallStatus = None,
-    skip: int = 0,
-    limit: int = 100
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: Optional[str] = None
 ):
-    return await get_calls(campaign_id=campaign_id, status=status, skip=skip, limit=limit)
+    return await get_calls(campaign_id=campaign_id, status=status, limit=limit, cursor=cursor)
 
 @router.put("/{call_id}/status", response_model=Call)
 async def update_status(
@@ -99,17 +113,64 @@ async def update_status(
     current_user = Depends(get_current_user)
 ):
     return await update_call_status(call_id, status)
+
+# app/services/call.py (continued)
+import asyncio
+from typing import Dict, Optional
+from app.db.base import db
+from app.db.pagination import Page, paginate
+
+async def get_calls(
+    campaign_id: Optional[str] = None,
+    status: Optional[CallStatus] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Page[Dict]:
+    """Calls, most recent first
+
+    Indexed as (campaign_id, status, timestamp desc, __name__ desc), with the
+    subsets for each filter combination.
+    """
+    calls_ref = db.collection('calls')
+    query = calls_ref
+    if campaign_id:
+        query = query.where('campaign_id', '==', campaign_id)
+    if status:
+        query = query.where('status', '==', status.value)
+    return await asyncio.to_thread(
+        paginate, calls_ref, query, order_field='timestamp', limit=limit, cursor=cursor
+    )
 ```
 
 3. Analytics endpoints:
 
 ```python
+# app/schemas/analytics.py (continued)
+from typing import Dict, Optional
+from pydantic import BaseModel
+
+class SentimentSummary(BaseModel):
+    avg: Optional[float] = None
+    p10: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    sample_size: int = 0
+
+class ApproximateDashboardMetrics(BaseModel):
+    """Estimates merged from daily call sketches (CallSketch.summary())"""
+    total_calls: int
+    unique_customers: int
+    # p50/p90/p99 call duration in seconds; None when no calls had a duration
+    duration_percentiles: Dict[str, Optional[float]]
+    sentiment: SentimentSummary
+
 # app/api/v1/endpoints/analytics.py
 from fastapi import APIRouter, Depends, Query
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime, timedelta
 from app.schemas.analytics import (
     DashboardMetrics,
+    ApproximateDashboardMetrics,
     CampaignMetrics,
     CallMetrics,
     PerformanceMetrics
@@ -118,23 +179,29 @@ from app.services.analytics import (
     get_dashboard_metrics,
     get_campaign_metrics,
     get_call_metrics,
-    get_performance_metrics
+    get_performance_metrics,
+    analytics_service
 )
 from app.api.deps import get_current_user
 
 router = APIRouter()
 
-@router.get("/dashboard", response_model=DashboardMetrics)
+@router.get("/dashboard", response_model=Union[DashboardMetrics, ApproximateDashboardMetrics])
 async def get_dashboard(
     current_user = Depends(get_current_user),
     start_date: Optional[datetime] = Query(default=None),
-    end_date: Optional[datetime] = Query(default=None)
+    end_date: Optional[datetime] = Query(default=None),
+    approximate: bool = Query(default=False)
 ):
     if not start_date:
         start_date = datetime.now() - timedelta(days=30)
     if not end_date:
         end_date = datetime.now()
     
+    # Merges per-day sketches instead of scanning every call in the range
+    if approximate:
+        return await analytics_service.approximate_metrics(start_date, end_date)
+    
     return await get_dashboard_metrics(start_date, end_date)
 
 @router.get("/campaigns/{campaign_id}", response_model=CampaignMetrics)
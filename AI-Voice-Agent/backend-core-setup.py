@@ -116,6 +116,16 @@ class Settings(BaseSettings):
     # Database
     FIREBASE_CREDENTIALS: str = os.getenv("FIREBASE_CREDENTIALS")
     
+    # Call queue workers (per API process)
+    QUEUE_MIN_WORKERS: int = int(os.getenv("QUEUE_MIN_WORKERS", "1"))
+    QUEUE_MAX_WORKERS: int = int(os.getenv("QUEUE_MAX_WORKERS", "10"))
+    QUEUE_MAX_INFLIGHT: int = int(os.getenv("QUEUE_MAX_INFLIGHT", "50"))
+    
+    # Parquet snapshots of call facts for offline analytics (needs pyarrow);
+    # one replica exports at a time, so the directory must be shared storage
+    ANALYTICS_SNAPSHOTS_ENABLED: bool = os.getenv("ANALYTICS_SNAPSHOTS_ENABLED", "false").lower() == "true"
+    ANALYTICS_SNAPSHOT_DIR: str = os.getenv("ANALYTICS_SNAPSHOT_DIR", "data/analytics_snapshots")
+    
     # External Services
     REVAI_API_KEY: str = os.getenv("REVAI_API_KEY", "")
     ELEVENLABS_API_KEY: str = os.getenv("ELEVENLABS_API_KEY", "")
@@ -168,6 +178,70 @@ cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS)
 firebase_admin.initialize_app(cred)
 
 db = firestore.client()
+
+# app/db/pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Generic, List, Optional, Tuple, TypeVar
+from firebase_admin import firestore
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+def encode_cursor(value: Any, doc_id: str) -> str:
+    """Opaque cursor for the position just after (value, doc_id)"""
+    is_datetime = isinstance(value, datetime)
+    payload = {"v": value.isoformat() if is_datetime else value, "dt": is_datetime, "id": doc_id}
+    encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return encoded.decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value = datetime.fromisoformat(payload["v"]) if payload["dt"] else payload["v"]
+        return value, payload["id"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid pagination cursor")
+
+def paginate(
+    collection,
+    query=None,
+    order_field: str = "created_at",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    descending: bool = True
+) -> Page[Dict]:
+    """Return one page of `query` (default: the whole collection)
+
+    Documents are ordered by `order_field`, then by document ID so the order
+    is total, and each page starts right after the cursor instead of skipping
+    an offset, so deep pages cost the same as the first one. Equality
+    filters combined with this ordering need a composite index on
+    (filter fields..., order_field, __name__) in the same direction.
+
+    The Firestore client blocks, so async callers run this through
+    asyncio.to_thread.
+    """
+    direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+    query = (collection if query is None else query) \
+        .order_by(order_field, direction=direction) \
+        .order_by(firestore.FieldPath.document_id(), direction=direction)
+    if cursor:
+        value, doc_id = decode_cursor(cursor)
+        query = query.start_after([value, collection.document(doc_id)])
+
+    # One extra document tells us whether there is a next page
+    docs = list(query.limit(limit + 1).stream())
+    page = docs[:limit]
+    next_cursor = None
+    if len(docs) > limit:
+        next_cursor = encode_cursor(page[-1].get(order_field), page[-1].id)
+    return Page(items=[{"id": doc.id, **doc.to_dict()} for doc in page], next_cursor=next_cursor)
 ```
 
 5. Base models:
@@ -272,10 +346,19 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     }
 
 # app/api/v1/endpoints/campaigns.py
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from uuid import uuid4
 from app.schemas.campaign import CampaignCreate, CampaignUpdate, Campaign
-from app.services.campaign import create_campaign, get_campaigns, get_campaign
+from app.db.pagination import Page
+from app.services.campaign import (
+    create_campaign,
+    get_campaigns,
+    get_campaign,
+    get_calling_windows,
+    update_campaign_status
+)
+from app.core.queue import call_queue, validate_calling_window
 from app.api.deps import get_current_user
 
 router = APIRouter()
@@ -287,13 +370,13 @@ async def create_new_campaign(
 ):
     return await create_campaign(campaign, current_user.id)
 
-@router.get("/", response_model=List[Campaign])
+@router.get("/", response_model=Page[Campaign])
 async def list_campaigns(
     current_user = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: Optional[str] = None
 ):
-    return await get_campaigns(current_user.id, skip, limit)
+    return await get_campaigns(current_user.id, limit=limit, cursor=cursor)
 
 @router.get("/{campaign_id}", response_model=Campaign)
 async def get_campaign_by_id(
@@ -304,6 +387,135 @@ async def get_campaign_by_id(
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     return campaign
+
+@router.post("/{campaign_id}/start")
+async def start_campaign(
+    campaign_id: str,
+    priority: int = 1,
+    weight: int = 1,
+    max_concurrent_calls: Optional[int] = None,
+    window_start_hour: Optional[int] = None,
+    window_end_hour: Optional[int] = None,
+    window_timezone: str = "UTC",
+    current_user = Depends(get_current_user)
+):
+    campaign = await get_campaign(campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    if campaign.status == "active":
+        raise HTTPException(status_code=409, detail="Campaign is already running")
+
+    # Calls outside the window, or before the campaign's start date, wait in the delayed queue
+    campaign_window = None
+    if window_start_hour is not None and window_end_hour is not None:
+        campaign_window = {
+            "timezone": window_timezone,
+            "start_hour": window_start_hour,
+            "end_hour": window_end_hour
+        }
+        try:
+            validate_calling_window(campaign_window)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    # Customers are called within their own hours; the campaign window is the fallback
+    windows = await get_calling_windows(campaign.target_list, default=campaign_window)
+
+    calls = [
+        {
+            "id": str(uuid4()),
+            "campaign_id": campaign.id,
+            "customer_id": customer_id,
+            "script_id": campaign.script_id,
+            "schedule": campaign.start_date,
+            **({"calling_window": windows[customer_id]} if customer_id in windows else {})
+        }
+        for customer_id in campaign.target_list
+    ]
+    # Marked active first, and only if no concurrent start got there before us
+    if not await update_campaign_status(campaign_id, "active", expected=campaign.status):
+        raise HTTPException(status_code=409, detail="Campaign is already running")
+    try:
+        await call_queue.set_campaign_limits(
+            campaign_id, weight=weight, max_inflight=max_concurrent_calls
+        )
+        await call_queue.enqueue_many(calls, priority=priority)
+    except Exception:
+        await update_campaign_status(campaign_id, campaign.status, expected="active")
+        raise
+
+    return {"campaign_id": campaign_id, "queued_calls": len(calls)}
+
+# app/services/campaign.py (continued)
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from firebase_admin import firestore
+from app.db.base import db
+from app.db.pagination import Page, paginate
+from app.core.logging import logger
+from app.core.queue import validate_calling_window
+
+@firestore.transactional
+def _set_status(transaction, ref, status: str, expected: Optional[str]) -> bool:
+    snapshot = ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return False
+    if expected is not None and snapshot.get('status') != expected:
+        return False
+    transaction.update(ref, {'status': status, 'updated_at': datetime.now(timezone.utc)})
+    return True
+
+def _calling_windows(customer_ids: List[str], default: Optional[Dict]) -> Dict[str, Dict]:
+    customers_ref = db.collection('customers')
+    windows = {}
+    for start in range(0, len(customer_ids), 500):
+        refs = [customers_ref.document(customer_id) for customer_id in customer_ids[start:start + 500]]
+        for snapshot in db.get_all(refs, field_paths=['calling_window', 'timezone']):
+            record = (snapshot.to_dict() or {}) if snapshot.exists else {}
+            window = record.get('calling_window')
+            if not window and record.get('timezone'):
+                # The campaign's hours (or the default ones) in the customer's own timezone
+                window = {**(default or {}), 'timezone': record['timezone']}
+            if window:
+                try:
+                    validate_calling_window(window)
+                except ValueError as e:
+                    logger.warning(f"Ignoring calling window of customer {snapshot.id}: {str(e)}")
+                    window = default
+            else:
+                window = default
+            if window:
+                windows[snapshot.id] = window
+    return windows
+
+async def get_calling_windows(customer_ids: List[str], default: Optional[Dict] = None) -> Dict[str, Dict]:
+    """Calling window per customer ID, from the customer's `calling_window` or `timezone`
+
+    Customers with neither, or an invalid one, get `default`; they are left
+    out if that is None too.
+    """
+    return await asyncio.to_thread(_calling_windows, customer_ids, default)
+
+async def update_campaign_status(campaign_id: str, status: str, expected: Optional[str] = None) -> bool:
+    """Set a campaign's status; with `expected`, only if it still has that status
+
+    The check and the write happen in one transaction, so of two
+    concurrent updates from the same status only one succeeds.
+    """
+    ref = db.collection('campaigns').document(campaign_id)
+    return await asyncio.to_thread(_set_status, db.transaction(), ref, status, expected)
+
+async def get_campaigns(user_id: str, limit: int = 100, cursor: Optional[str] = None) -> Page[Dict]:
+    """A user's campaigns, newest first; index: (created_by, created_at desc, __name__ desc)"""
+    campaigns_ref = db.collection('campaigns')
+    return await asyncio.to_thread(
+        paginate,
+        campaigns_ref,
+        campaigns_ref.where('created_by', '==', user_id),
+        order_field='created_at',
+        limit=limit,
+        cursor=cursor
+    )
 ```
 
 8. Requirements.txt:
@@ -317,6 +529,8 @@ python-multipart==0.0.6
 firebase-admin==6.2.0
 pydantic==2.4.2
 pydantic-settings==2.0.3
+numpy==1.26.2
+pyarrow==14.0.1
 python-jose[cryptography]==3.3.0
 pytest==7.4.3
 httpx==0.25.1
@@ -3,254 +3,3081 @@
 ```python
 # app/core/queue.py
 import aioredis
+import asyncio
 import json
-from typing import Optional, List
-from datetime import datetime, timedelta
+import time
+from typing import Optional, List, Dict, Tuple, AsyncIterator
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from aioredis.exceptions import ResponseError
 from app.core.config import settings
+from app.core.logging import logger
+
+# Calls are queued per campaign in `call_queue:<campaign_id>` sorted sets that
+# only hold call IDs; payloads live in a separate hash keyed by call ID.
+# Campaigns with queued calls sit in a ring that workers serve by weighted
+# round-robin, so one large campaign can't starve the others. Claimed calls
+# keep their campaign and original score in the processing hash and get a
+# lease deadline so the reaper can put them back if the worker dies.
+# Calls that can't be placed yet (scheduled callbacks, outside the customer's
+# calling hours) wait in a delayed sorted set scored by when they become
+# eligible. Ready calls whose calling window has closed are set aside as
+# missed instead of being handed to a worker.
+# Every claim bumps the call's attempt count, which doubles as the lease
+# token: heartbeats and completions from a worker whose lease was reaped
+# don't match and are refused. Calls that fail or lose their lease retry
+# through the delayed set with a backoff, and are dead-lettered once they
+# have used up their attempts.
+# The scripts touch the per-campaign queues the ring points at, which can't
+# be declared up front, so the queue needs a single-node Redis (not Cluster).
+QUEUE_LUA = """
+local ring, processing, leases, payloads = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local inflight, caps, weights, credits = KEYS[5], KEYS[6], KEYS[7], KEYS[8]
+local wakeup, results, delayed, delayed_meta = KEYS[9], KEYS[10], KEYS[11], KEYS[12]
+local window_ends, missed, attempts, dead_letter = KEYS[13], KEYS[14], KEYS[15], KEYS[16]
+local eligible = KEYS[17]
+local queue_prefix = ARGV[1]
+
+-- Hand out tokens that blocked workers wait on, one worker per token
+local function wake(n)
+    for _ = 1, math.min(n, 100) do
+        redis.call('LPUSH', wakeup, 1)
+    end
+    redis.call('LTRIM', wakeup, 0, 99)
+end
+
+local function activate(campaign)
+    if not redis.call('LPOS', ring, campaign) then
+        redis.call('RPUSH', ring, campaign)
+        redis.call('HSET', credits, campaign, redis.call('HGET', weights, campaign) or 1)
+    end
+end
+
+local function deactivate(campaign)
+    redis.call('LREM', ring, 1, campaign)
+    redis.call('HDEL', credits, campaign)
+end
+
+-- `eligible_at` is when the call became ready, reported on claim to measure queue wait
+local function make_ready(campaign, call_id, score, closes, eligible_at)
+    redis.call('ZADD', queue_prefix .. campaign, score, call_id)
+    redis.call('HSET', eligible, call_id, eligible_at)
+    if closes and closes > 0 then
+        redis.call('HSET', window_ends, call_id, closes)
+    else
+        redis.call('HDEL', window_ends, call_id)
+    end
+end
+
+local function release(call_id)
+    local entry = redis.call('HGET', processing, call_id)
+    redis.call('HDEL', processing, call_id)
+    redis.call('ZREM', leases, call_id)
+    if not entry then
+        return nil
+    end
+    entry = cjson.decode(entry)
+    if redis.call('HINCRBY', inflight, entry['campaign'], -1) <= 0 then
+        redis.call('HDEL', inflight, entry['campaign'])
+    end
+    if redis.call('HEXISTS', caps, entry['campaign']) == 1 then
+        -- A capped campaign may have calls waiting for this slot
+        wake(1)
+    end
+    return entry
+end
+
+-- The processing entry for a call, if `attempt` still holds its lease
+local function held_lease(call_id, attempt)
+    local entry = redis.call('HGET', processing, call_id)
+    if entry and tonumber(cjson.decode(entry)['attempt']) == tonumber(attempt) then
+        return entry
+    end
+    return nil
+end
+
+-- Retry a released call after a backoff, or dead-letter it once it has
+-- used up its attempts
+local function retry_or_bury(call_id, entry, now, max_attempts, retry_delay)
+    local attempt = tonumber(entry['attempt']) or 1
+    if attempt >= max_attempts then
+        redis.call('ZADD', dead_letter, now, call_id)
+        return
+    end
+    redis.call('ZADD', delayed, now + retry_delay * 2 ^ (attempt - 1), call_id)
+    redis.call('HSET', delayed_meta, call_id, cjson.encode({
+        campaign = entry['campaign'],
+        score = entry['score'],
+        closes = tonumber(redis.call('HGET', window_ends, call_id)) or 0
+    }))
+end
+
+local function claim_next(now, deadline)
+    -- Bounded so a run of missed calls can't keep the script busy for long
+    for _ = 1, redis.call('LLEN', ring) + 100 do
+        local campaign = redis.call('LINDEX', ring, 0)
+        if not campaign then
+            return false
+        end
+        local queue = queue_prefix .. campaign
+        local cap = tonumber(redis.call('HGET', caps, campaign))
+        local active = tonumber(redis.call('HGET', inflight, campaign) or 0)
+        if cap and active >= cap then
+            redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+        else
+            local popped = redis.call('ZPOPMIN', queue)
+            local call_id = popped[1]
+            local claimed = false
+            local payload, attempt, eligible_at
+            if call_id then
+                local closes = tonumber(redis.call('HGET', window_ends, call_id))
+                payload = redis.call('HGET', payloads, call_id)
+                eligible_at = redis.call('HGET', eligible, call_id)
+                redis.call('HDEL', eligible, call_id)
+                if not payload then
+                    -- Completed elsewhere after being requeued; nothing left to place
+                    redis.call('HDEL', window_ends, call_id)
+                elseif closes and closes <= now then
+                    -- Calling window closed while queued; the promoter reschedules it
+                    redis.call('ZADD', missed, popped[2], call_id)
+                    redis.call('HDEL', window_ends, call_id)
+                else
+                    attempt = redis.call('HINCRBY', attempts, call_id, 1)
+                    redis.call('HSET', processing, call_id,
+                        cjson.encode({campaign = campaign, score = popped[2], attempt = attempt}))
+                    redis.call('ZADD', leases, deadline, call_id)
+                    redis.call('HINCRBY', inflight, campaign, 1)
+                    claimed = true
+                end
+            end
+            if redis.call('ZCARD', queue) == 0 then
+                deactivate(campaign)
+            elseif claimed and redis.call('HINCRBY', credits, campaign, -1) <= 0 then
+                -- Campaign used up its share of this round
+                redis.call('HSET', credits, campaign, redis.call('HGET', weights, campaign) or 1)
+                redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+            end
+            if claimed then
+                return {payload, attempt, eligible_at or ''}
+            end
+        end
+    end
+    return false
+end
+"""
+
+# ARGV: queue prefix, campaign ID, now, then
+# (call ID, score, payload, eligible at, window closes) tuples
+ENQUEUE_CALLS_SCRIPT = QUEUE_LUA + """
+local campaign = ARGV[2]
+local now = tonumber(ARGV[3])
+local ready = 0
+for i = 4, #ARGV, 5 do
+    local call_id, score = ARGV[i], ARGV[i + 1]
+    local eligible_at, closes = tonumber(ARGV[i + 3]), tonumber(ARGV[i + 4])
+    redis.call('HSET', payloads, call_id, ARGV[i + 2])
+    if eligible_at > now then
+        redis.call('ZADD', delayed, eligible_at, call_id)
+        redis.call('HSET', delayed_meta, call_id,
+            cjson.encode({campaign = campaign, score = score, closes = closes}))
+    else
+        make_ready(campaign, call_id, score, closes, eligible_at)
+        ready = ready + 1
+    end
+end
+if ready > 0 then
+    activate(campaign)
+    wake(ready)
+end
+return ready
+"""
+
+# ARGV: queue prefix, lease deadline, max calls to claim, now
+CLAIM_CALLS_SCRIPT = QUEUE_LUA + """
+local claimed = {}
+for _ = 1, tonumber(ARGV[3]) do
+    local call_data = claim_next(tonumber(ARGV[4]), ARGV[2])
+    if not call_data then
+        break
+    end
+    table.insert(claimed, call_data)
+end
+return claimed
+"""
+
+# ARGV: queue prefix, call ID, attempt, lease deadline
+HEARTBEAT_SCRIPT = QUEUE_LUA + """
+if not held_lease(ARGV[2], ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', leases, ARGV[4], ARGV[2])
+return 1
+"""
+
+# ARGV: queue prefix, call ID, attempt, campaign ID, result, oldest stream ID to keep
+COMPLETE_CALL_SCRIPT = QUEUE_LUA + """
+local call_id, campaign = ARGV[2], ARGV[4]
+if redis.call('HEXISTS', payloads, call_id) == 0 then
+    -- Already completed
+    return false
+end
+if held_lease(call_id, ARGV[3]) then
+    release(call_id)
+elseif redis.call('HEXISTS', processing, call_id) == 1 then
+    -- Reaped and claimed again; the worker holding the lease now reports it
+    return false
+else
+    -- Lease was reaped but the call did happen: take it back out of the queues
+    redis.call('ZREM', queue_prefix .. campaign, call_id)
+    if redis.call('ZCARD', queue_prefix .. campaign) == 0 then
+        deactivate(campaign)
+    end
+    redis.call('ZREM', delayed, call_id)
+    redis.call('HDEL', delayed_meta, call_id)
+    redis.call('ZREM', missed, call_id)
+    redis.call('ZREM', dead_letter, call_id)
+end
+redis.call('HDEL', payloads, call_id)
+redis.call('HDEL', window_ends, call_id)
+redis.call('HDEL', eligible, call_id)
+redis.call('HDEL', attempts, call_id)
+return redis.call('XADD', results, 'MINID', '~', ARGV[6], '*',
+    'call_id', call_id, 'result', ARGV[5])
+"""
+
+# ARGV: queue prefix, call ID, attempt, now, max attempts, retry delay
+FAIL_CALL_SCRIPT = QUEUE_LUA + """
+if not held_lease(ARGV[2], ARGV[3]) then
+    return 0
+end
+retry_or_bury(ARGV[2], release(ARGV[2]), tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6]))
+return 1
+"""
+
+# ARGV: queue prefix, now, max calls to requeue, max attempts, retry delay
+REAP_CALLS_SCRIPT = QUEUE_LUA + """
+local expired = redis.call('ZRANGEBYSCORE', leases, '-inf', ARGV[2], 'LIMIT', 0, ARGV[3])
+for _, call_id in ipairs(expired) do
+    local entry = release(call_id)
+    if entry then
+        retry_or_bury(call_id, entry, tonumber(ARGV[2]), tonumber(ARGV[4]), tonumber(ARGV[5]))
+    end
+end
+return #expired
+"""
+
+# ARGV: queue prefix, now, max calls to promote
+PROMOTE_CALLS_SCRIPT = QUEUE_LUA + """
+local due = redis.call('ZRANGEBYSCORE', delayed, '-inf', ARGV[2], 'WITHSCORES', 'LIMIT', 0, ARGV[3])
+for i = 1, #due, 2 do
+    local call_id = due[i]
+    local meta = redis.call('HGET', delayed_meta, call_id)
+    redis.call('ZREM', delayed, call_id)
+    redis.call('HDEL', delayed_meta, call_id)
+    if meta then
+        meta = cjson.decode(meta)
+        -- Queue wait restarts when the call was due, not when it was first queued
+        make_ready(meta['campaign'], call_id, meta['score'], tonumber(meta['closes']), due[i + 1])
+        activate(meta['campaign'])
+    end
+end
+wake(#due / 2)
+return #due / 2
+"""
+
+def validate_calling_window(window: dict):
+    """Raise ValueError unless `window` describes a usable calling window"""
+    start_hour, end_hour = window.get("start_hour", 9), window.get("end_hour", 21)
+    if not 0 <= start_hour <= 23 or not 0 <= end_hour <= 24 or start_hour == end_hour:
+        raise ValueError(f"Invalid calling window hours: {start_hour}-{end_hour}")
+    try:
+        ZoneInfo(window.get("timezone", "UTC"))
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown calling window timezone: {window.get('timezone')}")
+
+def calling_window(call_data: dict, now: datetime) -> Tuple[datetime, Optional[datetime]]:
+    """Earliest time a call may be placed and when that calling window closes
+
+    Honours the call's `schedule` (callback time) and the customer's
+    `calling_window` ({"timezone", "start_hour", "end_hour"}), if present.
+    A window whose end hour is before its start hour runs past midnight,
+    and an end hour of 24 means midnight.
+    """
+    eligible_at = now
+    schedule = call_data.get("schedule")
+    if schedule:
+        if isinstance(schedule, str):
+            schedule = datetime.fromisoformat(schedule)
+        if schedule.tzinfo is None:
+            schedule = schedule.replace(tzinfo=timezone.utc)
+        eligible_at = max(eligible_at, schedule)
+
+    window = call_data.get("calling_window")
+    if not window:
+        return eligible_at, None
+
+    validate_calling_window(window)
+    start_hour, end_hour = window.get("start_hour", 9), window.get("end_hour", 21)
+    length = timedelta(hours=(end_hour - start_hour) % 24 or 24)
+    local = eligible_at.astimezone(ZoneInfo(window.get("timezone", "UTC")))
+    opens = local.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+    if opens > local and local < opens - timedelta(days=1) + length:
+        # Still inside last night's window
+        return local, opens - timedelta(days=1) + length
+    if local >= opens + length:
+        opens += timedelta(days=1)
+    return max(local, opens), opens + length
 
 class CallQueue:
     def __init__(self):
         self.redis = aioredis.from_url(settings.REDIS_URL)
         self.queue_key = "call_queue"
+        self.campaigns_key = "call_queue:campaigns"
+        self.weights_key = "call_queue:weights"
+        self.caps_key = "call_queue:caps"
+        self.credits_key = "call_queue:credits"
+        self.inflight_key = "call_queue:inflight"
+        self.wakeup_key = "call_queue:wakeup"
+        self.delayed_key = "call_queue:delayed"
+        self.delayed_meta_key = "call_queue:delayed_meta"
+        self.window_ends_key = "call_queue:window_ends"
+        self.missed_key = "call_queue:missed"
+        self.attempts_key = "call_queue:attempts"
+        self.dead_letter_key = "call_queue:dead_letter"
+        self.eligible_key = "call_queue:eligible_at"
+        self.payloads_key = "call_payloads"
         self.processing_key = "processing_calls"
+        self.leases_key = "processing_leases"
         self.results_key = "call_results"
+        self.results_dead_letter_key = "call_results:dead_letter"
+        self.default_campaign = "default"
+        self.batch_size = 1000
+        self.lease_timeout = 60  # seconds
+        self.max_attempts = 3
+        self.retry_delay = 15  # seconds, doubled on each further attempt
+        self.results_retention = timedelta(hours=24)
+        self.max_result_deliveries = 5  # before a result a consumer keeps failing on is set aside
+        self.results_abandoned_after = 600  # seconds a consumer must be silent to be taken over
+        self.results_adopt_interval = 60  # seconds between checks for abandoned consumers
+        self._enqueue_calls = self.redis.register_script(ENQUEUE_CALLS_SCRIPT)
+        self._claim_calls = self.redis.register_script(CLAIM_CALLS_SCRIPT)
+        self._heartbeat = self.redis.register_script(HEARTBEAT_SCRIPT)
+        self._complete_call = self.redis.register_script(COMPLETE_CALL_SCRIPT)
+        self._fail_call = self.redis.register_script(FAIL_CALL_SCRIPT)
+        self._reap_calls = self.redis.register_script(REAP_CALLS_SCRIPT)
+        self._promote_calls = self.redis.register_script(PROMOTE_CALLS_SCRIPT)
+
+    @property
+    def _script_keys(self) -> List[str]:
+        return [
+            self.campaigns_key,
+            self.processing_key,
+            self.leases_key,
+            self.payloads_key,
+            self.inflight_key,
+            self.caps_key,
+            self.weights_key,
+            self.credits_key,
+            self.wakeup_key,
+            self.results_key,
+            self.delayed_key,
+            self.delayed_meta_key,
+            self.window_ends_key,
+            self.missed_key,
+            self.attempts_key,
+            self.dead_letter_key,
+            self.eligible_key
+        ]
+
+    @property
+    def _queue_prefix(self) -> str:
+        return f"{self.queue_key}:"
+
+    def _lease_deadline(self) -> float:
+        return datetime.now().timestamp() + self.lease_timeout
+
+    async def set_campaign_limits(
+        self,
+        campaign_id: str,
+        weight: int = 1,
+        max_inflight: Optional[int] = None
+    ):
+        """Set a campaign's round-robin weight and optional concurrency cap"""
+        pipe = self.redis.pipeline()
+        pipe.hset(self.weights_key, campaign_id, weight)
+        if max_inflight is None:
+            pipe.hdel(self.caps_key, campaign_id)
+        else:
+            pipe.hset(self.caps_key, campaign_id, max_inflight)
+        await pipe.execute()
 
     async def enqueue_call(self, call_data: dict, priority: int = 1):
         """Add call to queue with priority (1-5, 5 highest)"""
-        call_id = call_data.get("id")
-        score = datetime.now().timestamp() + (6 - priority) * 1000
-        await self.redis.zadd(self.queue_key, {json.dumps(call_data): score})
-        return call_id
-
-    async def dequeue_call(self) -> Optional[dict]:
-        """Get next call from queue"""
-        calls = await self.redis.zrange(self.queue_key, 0, 0, withscores=True)
-        if not calls:
+        call_ids = await self.enqueue_many([call_data], priority)
+        return call_ids[0]
+
+    async def enqueue_many(self, calls: List[dict], priority: int = 1) -> List[str]:
+        """Add many calls with the same priority, one round trip per chunk"""
+        base_score = datetime.now().timestamp() + (6 - priority) * 1000
+        call_ids = [call_data.get("id") or str(uuid4()) for call_data in calls]
+        # Offset scores slightly so calls keep their submission order
+        await self._add_calls([
+            ({**call_data, "id": call_id}, base_score + i * 1e-6)
+            for i, (call_id, call_data) in enumerate(zip(call_ids, calls))
+        ])
+        return call_ids
+
+    async def _add_calls(self, entries: List[Tuple[dict, float]]):
+        """Store calls and put each one in its ready or delayed queue
+
+        Raises ValueError for an invalid calling window before anything is stored.
+        """
+        now = datetime.now(timezone.utc)
+        by_campaign: Dict[str, List[list]] = {}
+        for call_data, score in entries:
+            campaign_id = call_data.get("campaign_id") or self.default_campaign
+            eligible_at, closes = calling_window(call_data, now)
+            # Stamped so workers can measure queue wait without a lookup; a
+            # claim after a retry's backoff reports the later time instead
+            call_data = {**call_data, "eligible_at": eligible_at.timestamp()}
+            by_campaign.setdefault(campaign_id, []).append([
+                call_data["id"],
+                score,
+                json.dumps(call_data, default=str),
+                eligible_at.timestamp(),
+                closes.timestamp() if closes else 0
+            ])
+
+        for campaign_id, campaign_args in by_campaign.items():
+            for start in range(0, len(campaign_args), self.batch_size):
+                args = [self._queue_prefix, campaign_id, now.timestamp()]
+                for call_args in campaign_args[start:start + self.batch_size]:
+                    args.extend(call_args)
+                await self._enqueue_calls(keys=self._script_keys, args=args)
+
+    async def dequeue_call(self, timeout: int = 5) -> Optional[dict]:
+        """Claim next call from queue, waiting up to `timeout` seconds for one"""
+        calls = await self.dequeue_many(1)
+        if calls:
+            return calls[0]
+
+        # Nothing claimable: block until a call is enqueued or a capped
+        # campaign frees a slot. Each wake-up token goes to exactly one
+        # waiting worker, so idle workers don't stampede the queue.
+        if not await self.redis.blpop(self.wakeup_key, timeout=timeout):
             return None
-        
-        call_data, score = calls[0]
-        if await self.redis.zrem(self.queue_key, call_data):
-            call = json.loads(call_data)
-            await self.redis.hset(self.processing_key, call["id"], call_data)
-            return call
-        return None
+        calls = await self.dequeue_many(1)
+        return calls[0] if calls else None
+
+    async def dequeue_many(self, n: int) -> List[dict]:
+        """Claim up to `n` calls from queue in a single round trip
+
+        Each call carries its `attempt` number, which identifies the lease.
+        """
+        claimed = await self._claim_calls(
+            keys=self._script_keys,
+            args=[
+                self._queue_prefix,
+                self._lease_deadline(),
+                n,
+                datetime.now().timestamp()
+            ]
+        )
+        calls = []
+        for call_data, attempt, eligible_at in claimed:
+            call = {**json.loads(call_data), "attempt": int(attempt)}
+            if eligible_at:
+                # Retries become eligible again after their backoff
+                call["eligible_at"] = float(eligible_at)
+            calls.append(call)
+        return calls
+
+    async def heartbeat(self, call: dict) -> bool:
+        """Extend the lease on a call that is still being processed
+
+        Returns False once the lease has been lost to the reaper.
+        """
+        extended = await self._heartbeat(
+            keys=self._script_keys,
+            args=[self._queue_prefix, call["id"], call["attempt"], self._lease_deadline()]
+        )
+        return bool(extended)
+
+    async def complete_call(self, call: dict, result: dict) -> bool:
+        """Mark call as completed and append result to the results stream
+
+        Returns False if the result was dropped because the call was already
+        completed, or was reaped and claimed by another worker.
+        """
+        # Entries older than the retention window are trimmed on write
+        min_id = int((datetime.now() - self.results_retention).timestamp() * 1000)
+        entry_id = await self._complete_call(
+            keys=self._script_keys,
+            args=[
+                self._queue_prefix,
+                call["id"],
+                call["attempt"],
+                call.get("campaign_id") or self.default_campaign,
+                json.dumps(result, default=str),
+                min_id
+            ]
+        )
+        return bool(entry_id)
+
+    async def fail_call(self, call: dict) -> bool:
+        """Release a call whose processing failed, to retry later or dead-letter"""
+        released = await self._fail_call(
+            keys=self._script_keys,
+            args=[
+                self._queue_prefix,
+                call["id"],
+                call["attempt"],
+                datetime.now().timestamp(),
+                self.max_attempts,
+                self.retry_delay
+            ]
+        )
+        return bool(released)
 
-    async def complete_call(self, call_id: str, result: dict):
-        """Mark call as completed and store result"""
-        await self.redis.hdel(self.processing_key, call_id)
-        await self.redis.hset(self.results_key, call_id, json.dumps(result))
+    async def create_results_group(self, group: str, start_id: str = "0"):
+        """Create a consumer group on the results stream if it doesn't exist"""
+        try:
+            await self.redis.xgroup_create(
+                self.results_key, group, id=start_id, mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read_results(
+        self,
+        group: str,
+        consumer: str,
+        count: int = 100,
+        block: int = 5000,
+        pending: bool = False
+    ) -> List[Tuple[str, str, dict]]:
+        """Read completed results for a consumer group as (entry_id, call_id, result)
+
+        With `pending=True`, re-reads entries this consumer received earlier
+        but never acknowledged instead of waiting for new ones.
+        """
+        while True:
+            response = await self.redis.xreadgroup(
+                group,
+                consumer,
+                {self.results_key: "0" if pending else ">"},
+                count=count,
+                block=None if pending else block
+            )
+            if not response:
+                return []
+
+            _, entries = response[0]
+            # Pending entries trimmed from the stream come back without fields
+            trimmed = [entry_id for entry_id, fields in entries if not fields]
+            if trimmed:
+                logger.warning(f"Skipping {len(trimmed)} call results trimmed before {group} handled them")
+                await self.ack_results(group, trimmed)
+            if len(trimmed) < len(entries):
+                return [
+                    (entry_id, fields[b"call_id"].decode(), json.loads(fields[b"result"]))
+                    for entry_id, fields in entries
+                    if fields
+                ]
+
+    async def ack_results(self, group: str, entry_ids: List[str]):
+        """Acknowledge results a consumer group has finished handling"""
+        if entry_ids:
+            await self.redis.xack(self.results_key, group, *entry_ids)
+
+    async def tail_results(
+        self,
+        group: str,
+        consumer: str,
+        count: int = 100
+    ) -> AsyncIterator[Tuple[str, List[Tuple[str, str, dict]]]]:
+        """Yield (consumer, batch) for completed results, acknowledging each batch once handled
+
+        Results left unacknowledged by a failed run are retried one at a
+        time, so one the consumer can't handle doesn't hold back the rest;
+        after `max_result_deliveries` attempts it is dead-lettered.
+
+        Results left pending by consumers that went away (a pod that was
+        replaced) are taken over under the departed consumer's name, which
+        is yielded with the batch: handlers that remember what each consumer
+        applied then still recognise what it got through before it died.
+        """
+        await self.create_results_group(group)
+        while True:
+            for owner in [consumer, *await self._abandoned_consumers(group, consumer)]:
+                await self._bury_undeliverable(group, owner)
+                while True:
+                    batch = await self.read_results(group, owner, count=1, pending=True)
+                    if not batch:
+                        break
+                    yield owner, batch
+                    await self.ack_results(group, [entry_id for entry_id, _, _ in batch])
+                if owner != consumer:
+                    await self.redis.xgroup_delconsumer(self.results_key, group, owner)
+                    logger.info(f"Took over pending call results of {owner} in {group}")
+
+            adopt_at = time.monotonic() + self.results_adopt_interval
+            while time.monotonic() < adopt_at:
+                batch = await self.read_results(group, consumer, count=count)
+                if batch:
+                    yield consumer, batch
+                    await self.ack_results(group, [entry_id for entry_id, _, _ in batch])
+
+    async def _abandoned_consumers(self, group: str, consumer: str) -> List[str]:
+        """Other consumers in the group with pending results that stopped reading"""
+        abandoned = []
+        for info in await self.redis.xinfo_consumers(self.results_key, group):
+            name = info["name"].decode() if isinstance(info["name"], bytes) else info["name"]
+            if (
+                name != consumer
+                and info["pending"]
+                and info["idle"] >= self.results_abandoned_after * 1000
+            ):
+                abandoned.append(name)
+        return abandoned
+
+    async def _bury_undeliverable(self, group: str, consumer: str):
+        """Move results this consumer keeps failing on to the dead-letter stream"""
+        stuck = await self.redis.xpending_range(
+            self.results_key, group, min="-", max="+", count=self.batch_size, consumername=consumer
+        )
+        entry_ids = [
+            entry["message_id"] for entry in stuck
+            if entry["times_delivered"] >= self.max_result_deliveries
+        ]
+        if not entry_ids:
+            return
+        for entry_id in entry_ids:
+            entries = await self.redis.xrange(self.results_key, min=entry_id, max=entry_id)
+            fields = entries[0][1] if entries else {}
+            await self.redis.xadd(
+                self.results_dead_letter_key,
+                {**fields, "group": group, "entry_id": entry_id},
+                maxlen=10000,
+                approximate=True
+            )
+            logger.error(f"Dead-lettered call result {entry_id} after repeated failures in {group}")
+        await self.ack_results(group, entry_ids)
+
+    async def requeue_expired(self) -> int:
+        """Retry calls with expired leases at their original priority, or dead-letter them"""
+        return await self._reap_calls(
+            keys=self._script_keys,
+            args=[
+                self._queue_prefix,
+                datetime.now().timestamp(),
+                self.batch_size,
+                self.max_attempts,
+                self.retry_delay
+            ]
+        )
+
+    async def run_reaper(self, interval: int = 15):
+        while True:
+            try:
+                requeued = await self.requeue_expired()
+                if requeued:
+                    logger.warning(f"Reaped {requeued} calls with expired leases")
+            except Exception as e:
+                logger.error(f"Queue reaper error: {str(e)}")
+            await asyncio.sleep(interval)
+
+    async def promote_due(self) -> int:
+        """Move delayed calls that became eligible into their campaign queues"""
+        return await self._promote_calls(
+            keys=self._script_keys,
+            args=[self._queue_prefix, datetime.now().timestamp(), self.batch_size]
+        )
+
+    async def reschedule_missed(self) -> int:
+        """Move calls whose calling window closed while queued to their next window"""
+        missed = await self.redis.zrange(
+            self.missed_key, 0, self.batch_size - 1, withscores=True
+        )
+        if not missed:
+            return 0
+
+        call_ids = [call_id.decode() for call_id, _ in missed]
+        payloads = await self.redis.hmget(self.payloads_key, call_ids)
+        await self._add_calls([
+            (json.loads(call_data), score)
+            for (_, score), call_data in zip(missed, payloads)
+            if call_data
+        ])
+        await self.redis.zrem(self.missed_key, *call_ids)
+        return len(call_ids)
+
+    async def run_promoter(self, interval: int = 1):
+        while True:
+            try:
+                # Drain in batches so callback bursts are promoted promptly
+                while await self.promote_due() >= self.batch_size:
+                    pass
+                await self.reschedule_missed()
+            except Exception as e:
+                logger.error(f"Queue promoter error: {str(e)}")
+            await asyncio.sleep(interval)
 
     async def get_queue_stats(self) -> dict:
         """Get current queue statistics"""
+        campaigns = [
+            campaign_id.decode()
+            for campaign_id in await self.redis.lrange(self.campaigns_key, 0, -1)
+        ]
+        pipe = self.redis.pipeline(transaction=False)
+        for campaign_id in campaigns:
+            pipe.zcard(f"{self._queue_prefix}{campaign_id}")
+        pipe.zcard(self.delayed_key)
+        pipe.hlen(self.processing_key)
+        pipe.xlen(self.results_key)
+        pipe.zcard(self.dead_letter_key)
+        *queued, scheduled, processing, completed, dead_lettered = await pipe.execute()
         return {
-            "queued": await self.redis.zcard(self.queue_key),
-            "processing": await self.redis.hlen(self.processing_key),
-            "completed": await self.redis.hlen(self.results_key)
+            "queued": sum(queued),
+            "scheduled": scheduled,
+            "processing": processing,
+            "completed": completed,
+            "dead_lettered": dead_lettered,
+            "campaigns": dict(zip(campaigns, queued))
         }
 
 call_queue = CallQueue()
 
 # app/services/queue_worker.py
 import asyncio
-from typing import Callable
+import itertools
+import math
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set
 from app.core.queue import call_queue
 from app.core.logging import logger
+from app.core.monitoring import monitoring_service
 
 class QueueWorker:
-    def __init__(self, worker_id: str, processor: Callable):
+    def __init__(self, worker_id: str, processor: Callable, max_inflight: int = 50):
         self.worker_id = worker_id
         self.processor = processor
+        self.max_inflight = max_inflight
+        self.slots = asyncio.Semaphore(max_inflight)
+        self.inflight: Set[asyncio.Task] = set()
+        self.recent_waits: Deque[float] = deque(maxlen=500)
         self.running = False
+        self.loop: Optional[asyncio.Task] = None  # the task running start()
 
     async def start(self):
         self.running = True
         logger.info(f"Worker {self.worker_id} started")
         
         while self.running:
+            # Wait for a free slot before claiming more work
+            await self.slots.acquire()
+            if not self.running:
+                self.slots.release()
+                break
             try:
-                call = await call_queue.dequeue_call()
-                if call:
-                    result = await self.processor(call)
-                    await call_queue.complete_call(call["id"], result)
-                else:
-                    await asyncio.sleep(1)
+                calls = await self._claim_calls()
             except Exception as e:
+                self.slots.release()
                 logger.error(f"Worker {self.worker_id} error: {str(e)}")
                 await asyncio.sleep(5)
+                continue
+
+            if not calls:
+                self.slots.release()
+                continue
+            if not self.running:
+                # Claimed while stopping: nothing would wait for these calls
+                self.slots.release()
+                await self._release_calls(calls)
+                break
+
+            self._spawn(calls[0])
+            for call in calls[1:]:
+                await self.slots.acquire()
+                self._spawn(call)
+
+    async def _claim_calls(self) -> List[dict]:
+        """Claim as many calls as there are free slots, blocking for one if idle"""
+        free_slots = self.max_inflight - len(self.inflight)
+        calls = await call_queue.dequeue_many(free_slots)
+        if calls:
+            return calls
+        call = await call_queue.dequeue_call()
+        return [call] if call else []
+
+    async def _release_calls(self, calls: List[dict]):
+        for call in calls:
+            try:
+                await call_queue.fail_call(call)
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} could not release call {call['id']}: {str(e)}")
+
+    def _spawn(self, call: dict):
+        if "eligible_at" in call:
+            wait = time.time() - call["eligible_at"]
+            self.recent_waits.append(wait)
+            monitoring_service.track_queue_wait(call.get("campaign_id"), wait)
+        task = asyncio.create_task(self._process(call))
+        self.inflight.add(task)
+        task.add_done_callback(self.inflight.discard)
+
+    async def _process(self, call: dict):
+        processing = asyncio.create_task(self.processor(call))
+        heartbeat = asyncio.create_task(self._heartbeat(call, processing))
+        start_time = time.monotonic()
+        status = "completed"
+        try:
+            result = await processing
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                raise
+            # The heartbeat cancelled the call after its lease was reaped
+            status = "lease_lost"
+        except Exception as e:
+            status = "failed"
+            logger.error(f"Worker {self.worker_id} failed call {call['id']}: {str(e)}")
+            # Only the call itself failed, so it can be retried
+            try:
+                await call_queue.fail_call(call)
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} could not release call {call['id']}: {str(e)}")
+        else:
+            await self._complete(call, {
+                "campaign_id": call.get("campaign_id"),
+                "customer_id": call.get("customer_id"),
+                "segment": call.get("segment"),
+                **result
+            })
+        finally:
+            heartbeat.cancel()
+            self.slots.release()
+            monitoring_service.track_call_processing(
+                call.get("campaign_id"), time.monotonic() - start_time
+            )
+            monitoring_service.track_worker_call(self.worker_id, status)
+
+    async def _complete(self, call: dict, result: dict):
+        """Record a placed call's result, retrying until Redis takes it
+
+        The call must not be dialled again, so its lease is never just left
+        to expire: the heartbeat keeps it alive until the result is recorded.
+        """
+        delay = 1
+        while True:
+            try:
+                await call_queue.complete_call(call, result)
+                return
+            except Exception as e:
+                logger.error(
+                    f"Worker {self.worker_id} could not record call {call['id']}, retrying: {str(e)}"
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    async def _heartbeat(self, call: dict, processing: asyncio.Task):
+        """Keep the call's lease alive while it is being processed
+
+        If the lease was lost, the call is cancelled so that only the worker
+        now holding it places the call.
+        """
+        while True:
+            await asyncio.sleep(call_queue.lease_timeout / 3)
+            try:
+                if not await call_queue.heartbeat(call):
+                    logger.warning(f"Worker {self.worker_id} lost the lease on call {call['id']}")
+                    processing.cancel()
+                    return
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} heartbeat error: {str(e)}")
 
     async def stop(self):
         self.running = False
+        # The claim loop may be waiting on the queue; it hands back anything it claims now
+        if self.loop:
+            await asyncio.gather(self.loop, return_exceptions=True)
+        while self.inflight:
+            logger.info(f"Worker {self.worker_id} draining {len(self.inflight)} calls")
+            await asyncio.gather(*list(self.inflight), return_exceptions=True)
         logger.info(f"Worker {self.worker_id} stopped")
 
+class WorkerPool:
+    """Grows and shrinks the set of QueueWorkers to match queue load"""
+
+    def __init__(
+        self,
+        processor: Callable,
+        min_workers: int = 1,
+        max_workers: int = 10,
+        max_inflight: int = 50,
+        target_wait: float = 30,  # seconds, p95 queue wait
+        max_loop_lag: float = 0.25,  # seconds
+        interval: int = 15
+    ):
+        self.processor = processor
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.max_inflight = max_inflight
+        self.target_wait = target_wait
+        self.max_loop_lag = max_loop_lag
+        self.interval = interval
+        self.workers: Dict[str, QueueWorker] = {}
+        self.draining: Set[asyncio.Task] = set()
+        self._supervisor: asyncio.Task = None
+
+    async def start(self):
+        for _ in range(self.min_workers):
+            self._add_worker()
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        if self._supervisor:
+            self._supervisor.cancel()
+        await asyncio.gather(
+            *(worker.stop() for worker in self.workers.values()),
+            *self.draining,
+            return_exceptions=True
+        )
+        self.workers.clear()
+
+    def _add_worker(self):
+        # Reuse the lowest free ID so per-worker metric series stay bounded by max_workers
+        worker_id = next(
+            f"worker-{i}" for i in itertools.count() if f"worker-{i}" not in self.workers
+        )
+        worker = QueueWorker(worker_id, self.processor, self.max_inflight)
+        self.workers[worker.worker_id] = worker
+        worker.loop = asyncio.create_task(worker.start())
+
+    def _remove_worker(self):
+        # Retire the least busy worker and let it finish its calls in the background
+        worker = min(self.workers.values(), key=lambda w: len(w.inflight))
+        del self.workers[worker.worker_id]
+        task = asyncio.create_task(worker.stop())
+        self.draining.add(task)
+        task.add_done_callback(self.draining.discard)
+
+    def _wait_percentile(self, percentile: float) -> float:
+        waits = sorted(wait for worker in self.workers.values() for wait in worker.recent_waits)
+        if not waits:
+            return 0
+        return waits[min(len(waits) - 1, int(len(waits) * percentile))]
+
+    async def _loop_lag(self, probe: float = 0.1) -> float:
+        start_time = time.monotonic()
+        await asyncio.sleep(probe)
+        return max(time.monotonic() - start_time - probe, 0)
+
+    async def _supervise(self):
+        while True:
+            try:
+                await self._rebalance()
+            except Exception as e:
+                logger.error(f"Worker pool supervisor error: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def _rebalance(self):
+        stats = await call_queue.get_queue_stats()
+        lag = await self._loop_lag()
+        p95_wait = self._wait_percentile(0.95)
+        busy = sum(len(worker.inflight) for worker in self.workers.values())
+        count = len(self.workers)
+
+        if lag > self.max_loop_lag:
+            # The event loop is saturated; more workers would only add latency
+            target = count - 1
+        elif stats["queued"] and p95_wait > self.target_wait:
+            target = count + math.ceil(stats["queued"] / self.max_inflight)
+        elif not stats["queued"] and busy < (count - 1) * self.max_inflight / 2:
+            target = count - 1
+        else:
+            target = count
+
+        target = max(self.min_workers, min(self.max_workers, target))
+        for _ in range(target - count):
+            self._add_worker()
+        for _ in range(count - target):
+            self._remove_worker()
+
+        if target != count:
+            logger.info(
+                f"Scaled queue workers {count} -> {target} "
+                f"(queued={stats['queued']}, p95_wait={p95_wait:.1f}s, loop_lag={lag:.3f}s)"
+            )
+        monitoring_service.update_queue_workers(target)
+
+# app/services/call_results.py
+import asyncio
+import socket
+from datetime import datetime, timezone
+from app.core.queue import call_queue
+from app.core.logging import logger
+from app.db.base import db
+from app.services.analytics import analytics_service
+from app.services.best_hours import best_hours_index
+
+def _with_timestamp(entry_id: bytes, result: dict) -> dict:
+    """Give a result a UTC datetime timestamp, defaulting to when it was added to the results stream
+
+    Results travel as JSON, so a processor's datetime arrives as a string;
+    Firestore range queries only match it once it is a datetime again.
+    """
+    timestamp = result.get('timestamp')
+    if not timestamp:
+        completed_ms = int(entry_id.split(b"-")[0])
+        timestamp = datetime.fromtimestamp(completed_ms / 1000, tz=timezone.utc)
+    elif isinstance(timestamp, (int, float)):
+        timestamp = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    elif isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return {**result, 'timestamp': timestamp.astimezone(timezone.utc)}
+
+async def persist_call_results(consumer: str = socket.gethostname()):
+    """Write completed call results to Firestore as they arrive"""
+    calls_ref = db.collection('calls')
+    while True:
+        try:
+            async for _, batch in call_queue.tail_results("firestore", consumer):
+                write_batch = db.batch()
+                for entry_id, call_id, result in batch:
+                    write_batch.set(
+                        calls_ref.document(call_id),
+                        _with_timestamp(entry_id, result),
+                        merge=True
+                    )
+                # The Firestore client blocks, so commit off the event loop
+                await asyncio.to_thread(write_batch.commit)
+        except Exception as e:
+            logger.error(f"Call result persistence error: {str(e)}")
+            await asyncio.sleep(5)
+
+async def update_call_rollups(consumer: str = socket.gethostname()):
+    """Fold completed call results into the analytics rollups and best-hours index as they arrive"""
+    while True:
+        try:
+            # Batches taken over from a departed consumer are applied under its name
+            async for owner, batch in call_queue.tail_results("rollups", consumer):
+                entries = [
+                    (entry_id, _with_timestamp(entry_id, result)) for entry_id, _, result in batch
+                ]
+                await analytics_service.record_call_results(entries, owner)
+                # Earlier calls are added to both by the analytics backfill
+                await best_hours_index.record_calls(
+                    entries, owner, since=await analytics_service.rollup_cutoff()
+                )
+        except Exception as e:
+            logger.error(f"Call rollup update error: {str(e)}")
+            await asyncio.sleep(5)
+
 # Usage in FastAPI app
 # app/main.py
 @app.on_event("startup")
 async def start_queue_workers():
-    workers = []
-    for i in range(settings.QUEUE_WORKERS):
-        worker = QueueWorker(f"worker-{i}", process_call)
-        asyncio.create_task(worker.start())
-        workers.append(worker)
-    app.state.queue_workers = workers
+    pool = WorkerPool(
+        process_call,
+        min_workers=settings.QUEUE_MIN_WORKERS,
+        max_workers=settings.QUEUE_MAX_WORKERS,
+        max_inflight=settings.QUEUE_MAX_INFLIGHT
+    )
+    await pool.start()
+    app.state.queue_workers = pool
+    app.state.queue_reaper = asyncio.create_task(call_queue.run_reaper())
+    app.state.queue_promoter = asyncio.create_task(call_queue.run_promoter())
+    app.state.results_writer = asyncio.create_task(persist_call_results())
+    app.state.rollup_writer = asyncio.create_task(update_call_rollups())
 
 @app.on_event("shutdown")
 async def stop_queue_workers():
-    for worker in app.state.queue_workers:
-        await worker.stop()
+    app.state.queue_reaper.cancel()
+    app.state.queue_promoter.cancel()
+    app.state.results_writer.cancel()
+    app.state.rollup_writer.cancel()
+    await app.state.queue_workers.stop()
 ```
 
 # 2. Advanced Caching System
 
 ```python
 # app/core/cache.py
-from typing import Optional, Any, Union
+from typing import Optional, Any, Union, Tuple, Dict, List, Callable
+from collections import OrderedDict
 import aioredis
+import asyncio
+import copy
+import hashlib
+import inspect
 import json
-from datetime import timedelta
+import math
+import pickle
+import random
+import time
+import uuid
+import zlib
+from datetime import date, datetime, timedelta
 from functools import wraps
+from aioredis.exceptions import ResponseError
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.monitoring import monitoring_service
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+def _encode_default(value: Any) -> Any:
+    """Fallback for types JSON/msgpack can't encode natively"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+class Codec:
+    def __init__(self, tag: bytes, dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any]):
+        self.tag = tag
+        self.dumps = dumps
+        self.loads = loads
+
+# pickle round-trips arbitrary Python objects; only use it for data we produced
+CODECS: Dict[str, Codec] = {
+    "json": Codec(
+        b"j",
+        lambda value: json.dumps(value, default=_encode_default).encode(),
+        json.loads
+    ),
+    "pickle": Codec(b"p", pickle.dumps, pickle.loads),
+}
+if orjson:
+    CODECS["orjson"] = Codec(
+        b"o",
+        # Like json, stringify non-str dict keys instead of raising
+        lambda value: orjson.dumps(value, default=_encode_default, option=orjson.OPT_NON_STR_KEYS),
+        orjson.loads
+    )
+if msgpack:
+    CODECS["msgpack"] = Codec(
+        b"m",
+        lambda value: msgpack.packb(value, default=_encode_default),
+        lambda data: msgpack.unpackb(data, raw=False)
+    )
+CODECS_BY_TAG = {codec.tag: codec for codec in CODECS.values()}
+
+# Encoded values are MAGIC + codec tag + compression flag + payload. Values
+# written before codecs existed are plain JSON and never start with MAGIC.
+MAGIC = b"\x00"
+COMPRESSED = b"z"
+UNCOMPRESSED = b"-"
+
+def key_prefix(key: str) -> str:
+    """The namespace part of a cache key, used to label metrics"""
+    return key.split(":", 1)[0]
+
+class LocalCache:
+    """Size-bounded in-process LRU with per-entry TTL
+
+    Values are copied in and out, so callers that mutate what they get (or
+    what they set) don't change the entry seen by every other request.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, copy.deepcopy(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+# Add members to a tag's index (scored by when each expires), drop members
+# that already have, and let the index expire with its longest-lived member.
+# Scripted rather than EXPIRE NX/GT, which need Redis 7.
+TAG_KEYS_SCRIPT = """
+local tag_key, now, expires_at = KEYS[1], ARGV[1], ARGV[2]
+for i = 3, #ARGV do
+    redis.call('ZADD', tag_key, expires_at, ARGV[i])
+end
+redis.call('ZREMRANGEBYSCORE', tag_key, '-inf', now)
+local last = redis.call('ZRANGE', tag_key, -1, -1, 'WITHSCORES')[2]
+if last == 'inf' then
+    redis.call('PERSIST', tag_key)
+elseif last then
+    redis.call('PEXPIREAT', tag_key, math.ceil(tonumber(last) * 1000) + 1000)
+end
+"""
+
+# Delete the lock only if we still hold it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
 
 class CacheManager:
-    def __init__(self):
+    def __init__(
+        self,
+        serializer: str = "orjson" if orjson else "json",
+        compress_threshold: int = 4096  # bytes
+    ):
         self.redis = aioredis.from_url(settings.REDIS_URL)
-
-    async def get(self, key: str) -> Optional[Any]:
+        self.serializer = serializer
+        self.compress_threshold = compress_threshold
+        self.local = LocalCache()
+        self.invalidation_channel = "cache_invalidation"
+        self.instance_id = str(uuid.uuid4())
+        self.invalidation_batch_size = 500
+        self._release_lock = self.redis.register_script(RELEASE_LOCK_SCRIPT)
+        self._tag_index = self.redis.register_script(TAG_KEYS_SCRIPT)
+
+    async def get(self, key: str, use_local: bool = True) -> Optional[Any]:
         """Get value from cache"""
-        value = await self.redis.get(key)
-        if value:
-            return json.loads(value)
+        start_time = time.perf_counter()
+        if use_local:
+            found, value = self.local.get(key)
+            if found:
+                self._track_lookup(key, "local_hit", start_time)
+                return value
+
+        # Fetch the remaining TTL in the same round trip so the local copy
+        # never outlives the Redis entry
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        raw, pttl = await pipe.execute()
+        readable, value = self._decode_or_miss(key, raw)
+        if readable:
+            self.local.set(key, value, pttl / 1000 if pttl > 0 else None)
+            self._track_lookup(key, "hit", start_time, len(raw))
+            return value
+        self._track_lookup(key, "miss", start_time)
         return None
 
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Get several values at once; keys that aren't cached are left out"""
+        start_time = time.perf_counter()
+        found: Dict[str, Any] = {}
+        remote_keys = []
+        for key in keys:
+            hit, value = self.local.get(key)
+            if hit:
+                found[key] = value
+                self._track_lookup(key, "local_hit", start_time)
+            else:
+                remote_keys.append(key)
+        if not remote_keys:
+            return found
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.mget(remote_keys)
+        for key in remote_keys:
+            pipe.pttl(key)
+        raw_values, *pttls = await pipe.execute()
+        for key, raw, pttl in zip(remote_keys, raw_values, pttls):
+            readable, value = self._decode_or_miss(key, raw)
+            if readable:
+                found[key] = value
+                self.local.set(key, value, pttl / 1000 if pttl > 0 else None)
+                self._track_lookup(key, "hit", start_time, len(raw))
+            else:
+                self._track_lookup(key, "miss", start_time)
+        return found
+
+    async def set_many(
+        self,
+        mapping: Dict[str, Any],
+        expire: Optional[Union[float, timedelta]] = None,
+        tags: Optional[List[str]] = None,
+        serializer: Optional[str] = None
+    ):
+        """Set several values in one round trip"""
+        if not mapping:
+            return
+        start_time = time.perf_counter()
+        expire = self._ttl_seconds(expire)
+        encoded = {key: self.encode(value, serializer) for key, value in mapping.items()}
+        pipe = self.redis.pipeline(transaction=False)
+        for key, raw in encoded.items():
+            pipe.set(key, raw, ex=expire)
+        await self._tag_keys(pipe, tags, list(encoded), expire)
+        await pipe.execute()
+
+        duration = (time.perf_counter() - start_time) / len(encoded)
+        for key, value in mapping.items():
+            self.local.set(key, value, expire)
+            monitoring_service.track_cache_write(key_prefix(key), duration, len(encoded[key]))
+        await self._publish_invalidation(list(mapping))
+
+    def _ttl_seconds(self, expire: Optional[Union[float, timedelta]]) -> Optional[int]:
+        # SET EX only takes whole seconds; round up so entries never expire early
+        if isinstance(expire, timedelta):
+            expire = expire.total_seconds()
+        return math.ceil(expire) if expire else None
+
+    def _track_lookup(self, key: str, result: str, start_time: float, size: int = 0):
+        monitoring_service.track_cache_lookup(
+            key_prefix(key), result, time.perf_counter() - start_time, size
+        )
+
     async def set(
         self, 
         key: str, 
         value: Any, 
-        expire: Optional[Union[int, timedelta]] = None
+        expire: Optional[Union[float, timedelta]] = None,
+        tags: Optional[List[str]] = None,
+        serializer: Optional[str] = None
     ):
-        """Set value in cache"""
-        await self.redis.set(
-            key,
-            json.dumps(value),
-            ex=expire.total_seconds() if isinstance(expire, timedelta) else expire
+        """Set value in cache, optionally tagging it for group invalidation"""
+        start_time = time.perf_counter()
+        expire = self._ttl_seconds(expire)
+        raw = self.encode(value, serializer)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(key, raw, ex=expire)
+        await self._tag_keys(pipe, tags, [key], expire)
+        await pipe.execute()
+        self.local.set(key, value, expire)
+        await self._publish_invalidation([key])
+        monitoring_service.track_cache_write(
+            key_prefix(key), time.perf_counter() - start_time, len(raw)
         )
 
+    async def _tag_keys(self, pipe, tags: Optional[List[str]], keys: List[str], expire: Optional[float]):
+        """Queue the script that adds `keys` to each tag's member index
+
+        Indexes are sorted sets scored by when each member expires, and every
+        write prunes members that already have, so an index never holds more
+        than its tag's live keys.
+        """
+        now = time.time()
+        expires_at = now + expire if expire else "inf"
+        for tag in tags or []:
+            await self._tag_index(
+                keys=[self._tag_key(tag)],
+                args=[now, expires_at, *keys],
+                client=pipe
+            )
+
+    def encode(self, value: Any, serializer: Optional[str] = None) -> bytes:
+        codec = CODECS[serializer or self.serializer]
+        data = codec.dumps(value)
+        if len(data) >= self.compress_threshold:
+            return MAGIC + codec.tag + COMPRESSED + zlib.compress(data, 1)
+        return MAGIC + codec.tag + UNCOMPRESSED + data
+
+    def decode(self, raw: bytes) -> Any:
+        """Decode a stored value; raises KeyError if its codec isn't installed here"""
+        if not raw.startswith(MAGIC):
+            return json.loads(raw)
+        codec = CODECS_BY_TAG[raw[1:2]]
+        data = raw[3:]
+        if raw[2:3] == COMPRESSED:
+            data = zlib.decompress(data)
+        return codec.loads(data)
+
+    def _decode_or_miss(self, key: str, raw: Optional[bytes]) -> Tuple[bool, Any]:
+        """(True, value) for a readable entry, (False, None) for a miss
+
+        In a mixed deployment another replica may have written the value with
+        a codec this one lacks; that is treated as a miss.
+        """
+        if not raw:
+            return False, None
+        try:
+            return True, self.decode(raw)
+        except KeyError:
+            logger.warning(f"Cache entry {key} uses codec {raw[1:2]!r}, which isn't installed")
+            return False, None
+
     async def delete(self, key: str):
         """Delete value from cache"""
         await self.redis.delete(key)
+        self.local.delete(key)
+        await self._publish_invalidation([key])
+
+    async def invalidate_tags(self, *tags: str):
+        """Invalidate every key stored with any of the given tags"""
+        for tag in tags:
+            # Detach the member index first so keys cached from now on start a fresh one
+            detached_key = f"{self._tag_key(tag)}:invalidating:{uuid.uuid4()}"
+            try:
+                await self.redis.rename(self._tag_key(tag), detached_key)
+            except ResponseError:
+                continue  # no keys carry this tag
+
+            batch = []
+            async for key, _ in self.redis.zscan_iter(detached_key, count=self.invalidation_batch_size):
+                batch.append(key.decode())
+                if len(batch) >= self.invalidation_batch_size:
+                    await self._invalidate_keys(batch)
+                    batch = []
+            if batch:
+                await self._invalidate_keys(batch)
+            await self.redis.unlink(detached_key)
+
+    async def _invalidate_keys(self, keys: List[str]):
+        # UNLINK frees memory in the background, so large batches never block Redis
+        await self.redis.unlink(*keys)
+        for key in keys:
+            self.local.delete(key)
+        await self._publish_invalidation(keys)
+
+    def _tag_key(self, tag: str) -> str:
+        return f"cache_tags:{tag}"
+
+    async def acquire_lock(self, key: str, timeout: int = 30) -> Optional[str]:
+        """Take a short-lived cross-process lock on a key; returns a token or None"""
+        token = str(uuid.uuid4())
+        if await self.redis.set(f"lock:{key}", token, nx=True, ex=timeout):
+            return token
+        return None
 
-    async def invalidate_pattern(self, pattern: str):
-        """Invalidate all keys matching pattern"""
-        keys = await self.redis.keys(pattern)
-        if keys:
-            await self.redis.delete(*keys)
+    async def release_lock(self, key: str, token: str):
+        await self._release_lock(keys=[f"lock:{key}"], args=[token])
+
+    async def _publish_invalidation(self, keys: List[str]):
+        """Tell other API replicas to drop their in-process copies"""
+        await self.redis.publish(self.invalidation_channel, json.dumps({
+            "source": self.instance_id,
+            "keys": keys
+        }))
+
+    async def listen_for_invalidations(self):
+        """Drop local entries invalidated by other replicas"""
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(self.invalidation_channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    event = json.loads(message["data"])
+                    if event["source"] == self.instance_id:
+                        continue
+                    for key in event["keys"]:
+                        self.local.delete(key)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {str(e)}")
+                # Entries may have been missed while disconnected
+                self.local = LocalCache(self.local.max_size, self.local.ttl)
+                await asyncio.sleep(1)
 
 cache_manager = CacheManager()
 
 # Decorator for caching
+# Recomputations in flight in this process, keyed by cache key
+_refreshing: Dict[str, asyncio.Task] = {}
+
+def _to_seconds(value: Optional[Union[int, timedelta]]) -> Optional[float]:
+    return value.total_seconds() if isinstance(value, timedelta) else value
+
+def _normalize_key_arg(value: Any, time_bucket: Optional[float]) -> str:
+    """Render an argument the same way every time it has the same meaning"""
+    if isinstance(value, datetime):
+        if time_bucket:
+            timestamp = value.timestamp()
+            value = datetime.fromtimestamp(timestamp - timestamp % time_bucket, tz=value.tzinfo)
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        seconds = value.total_seconds()
+        if time_bucket:
+            seconds = round(seconds / time_bucket) * time_bucket
+        return f"{seconds:g}s"
+    if isinstance(value, (set, frozenset)):
+        value = sorted(value, key=str)
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, sort_keys=True, default=_encode_default, separators=(",", ":"))
+    return str(value)
+
+def build_cache_key(
+    key_prefix: str,
+    signature: inspect.Signature,
+    args: tuple,
+    kwargs: dict,
+    time_bucket: Optional[float] = None,
+    max_length: int = 200
+) -> Tuple[str, Dict[str, Any]]:
+    """Build a cache key from a call's bound arguments, ignoring `self`/`cls`
+
+    Returns the key and the arguments it was built from. Keys longer than
+    `max_length` are hashed.
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {
+        name: value
+        for name, value in bound.arguments.items()
+        if name not in ("self", "cls")
+    }
+    key = ":".join([key_prefix, *(
+        f"{name}={_normalize_key_arg(value, time_bucket)}"
+        for name, value in arguments.items()
+    )])
+    if len(key) > max_length:
+        key = f"{key_prefix}:{hashlib.sha256(key.encode()).hexdigest()}"
+    return key, arguments
+
+def _log_refresh_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error(f"Cache refresh failed: {str(task.exception())}")
+
 def cached(
     key_prefix: str,
     expire: Optional[Union[int, timedelta]] = None,
-    invalidate_on_update: bool = True
+    invalidate_on_update: bool = True,
+    stale_ttl: Optional[Union[int, timedelta]] = None,
+    early_refresh: bool = False,
+    lock_timeout: int = 30,
+    tags: Optional[Callable[..., List[str]]] = None,
+    serializer: Optional[str] = None,
+    time_bucket: Optional[Union[int, timedelta]] = None,
+    negative_expire: Optional[Union[int, timedelta]] = 60
 ):
+    """Cache an async function's result.
+
+    Concurrent misses for the same key share one recomputation per process,
+    and a Redis lock keeps other processes from recomputing at the same time.
+    With `stale_ttl`, an expired value keeps being served for that long while
+    it is refreshed in the background. With `early_refresh`, values are
+    refreshed shortly before they expire, with a probability that rises as
+    expiry approaches and with how long the value took to compute.
+
+    Keys are built from the function's named arguments, leaving out `self`,
+    so methods share entries across instances. `time_bucket` rounds
+    datetime and timedelta arguments so near-identical time ranges reuse
+    the same entry.
+
+    A `None` result is cached too, for `negative_expire` instead of
+    `expire` (pass `negative_expire=None` to always recompute it).
+
+    Every entry is tagged with `key_prefix`, plus whatever `tags` returns
+    when called with the function's arguments as keywords, so it can be
+    dropped with `cache_manager.invalidate_tags(...)`.
+    """
+    expire_seconds = _to_seconds(expire)
+    stale_seconds = _to_seconds(stale_ttl) or 0
+    bucket_seconds = _to_seconds(time_bucket)
+    negative_seconds = _to_seconds(negative_expire)
+
     def decorator(func):
+        signature = inspect.signature(func)
+
+        async def wait_for_refresh(cache_key: str) -> Optional[dict]:
+            """Poll for the value another process is computing"""
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                entry = await cache_manager.get(cache_key, use_local=False)
+                if entry is not None and (
+                    entry["fresh_until"] is None or entry["fresh_until"] > time.time()
+                ):
+                    return entry
+            return None
+
+        async def recompute(cache_key: str, arguments: Dict[str, Any], args, kwargs):
+            token = await cache_manager.acquire_lock(cache_key, lock_timeout)
+            if token is None:
+                entry = await wait_for_refresh(cache_key)
+                if entry is not None:
+                    return entry["value"]
+                # The other process gave up or died; compute it ourselves
+
+            try:
+                start_time = time.monotonic()
+                result = await func(*args, **kwargs)
+                # Entries wrap the value, so a cached None is distinguishable from a miss
+                ttl = expire_seconds if result is not None else negative_seconds
+                if result is not None or negative_seconds:
+                    entry = {
+                        "value": result,
+                        "fresh_until": time.time() + ttl if ttl else None,
+                        "compute_time": time.monotonic() - start_time
+                    }
+                    await cache_manager.set(
+                        cache_key,
+                        entry,
+                        ttl + stale_seconds if ttl else None,
+                        tags=[key_prefix, *(tags(**arguments) if tags else [])],
+                        serializer=serializer
+                    )
+                return result
+            finally:
+                if token:
+                    await cache_manager.release_lock(cache_key, token)
+
+        def refresh(cache_key: str, arguments: Dict[str, Any], args, kwargs) -> asyncio.Task:
+            task = _refreshing.get(cache_key)
+            if task is None:
+                task = asyncio.create_task(recompute(cache_key, arguments, args, kwargs))
+                _refreshing[cache_key] = task
+                task.add_done_callback(lambda _: _refreshing.pop(cache_key, None))
+                task.add_done_callback(_log_refresh_error)
+            return task
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # Generate cache key
-            key_parts = [key_prefix]
-            key_parts.extend(str(arg) for arg in args)
-            key_parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
-            cache_key = ":".join(key_parts)
+            cache_key, arguments = build_cache_key(
+                key_prefix, signature, args, kwargs, bucket_seconds
+            )
 
             # Try to get from cache
-            cached_value = await cache_manager.get(cache_key)
-            if cached_value is not None:
-                return cached_value
-
-            # Get fresh value
-            result = await func(*args, **kwargs)
-            
-            # Cache the result
-            await cache_manager.set(cache_key, result, expire)
-            
-            return result
+            entry = await cache_manager.get(cache_key)
+            if entry is not None:
+                now = time.time()
+                fresh_until = entry["fresh_until"]
+                if fresh_until is None or now < fresh_until:
+                    if early_refresh and fresh_until and (
+                        now - entry["compute_time"] * math.log(random.random()) >= fresh_until
+                    ):
+                        refresh(cache_key, arguments, args, kwargs)
+                    return entry["value"]
+                if stale_seconds:
+                    refresh(cache_key, arguments, args, kwargs)
+                    return entry["value"]
+
+            # Get fresh value, sharing any recomputation already under way
+            return await asyncio.shield(refresh(cache_key, arguments, args, kwargs))
+        return wrapper
+    return decorator
+
+def cached_many(
+    key_prefix: str,
+    expire: Optional[Union[int, timedelta]] = None,
+    ids_arg: str = "ids",
+    negative_expire: Optional[Union[int, timedelta]] = 60,
+    serializer: Optional[str] = None
+):
+    """Cache a batch function `func(ids, ...) -> Dict[id, value]` per ID.
+
+    Cached IDs are read with one multi-get and only the missing ones are
+    passed on to `func`, in a single call. IDs that `func` returns nothing
+    for are cached as absent for `negative_expire`.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            ids = list(bound.arguments[ids_arg])
+            suffix = [
+                f"{name}={_normalize_key_arg(value, None)}"
+                for name, value in bound.arguments.items()
+                if name not in (ids_arg, "self", "cls")
+            ]
+            keys = {item_id: ":".join([key_prefix, f"id={item_id}", *suffix]) for item_id in ids}
+
+            cached_values = await cache_manager.get_many(list(keys.values()))
+            results = {
+                item_id: cached_values[key]
+                for item_id, key in keys.items()
+                if key in cached_values and cached_values[key] is not None
+            }
+            missing = [item_id for item_id, key in keys.items() if key not in cached_values]
+            if not missing:
+                return results
+
+            bound.arguments[ids_arg] = missing
+            fresh = await func(*bound.args, **bound.kwargs) or {}
+            results.update(fresh)
+
+            await cache_manager.set_many(
+                {keys[item_id]: fresh[item_id] for item_id in missing if item_id in fresh},
+                expire,
+                tags=[key_prefix],
+                serializer=serializer
+            )
+            if negative_expire:
+                await cache_manager.set_many(
+                    {keys[item_id]: None for item_id in missing if item_id not in fresh},
+                    negative_expire,
+                    tags=[key_prefix],
+                    serializer=serializer
+                )
+            return results
         return wrapper
     return decorator
 
 # Usage example
-@cached("campaign_metrics", expire=timedelta(minutes=5))
+@cached(
+    "campaign_metrics",
+    expire=timedelta(minutes=5),
+    stale_ttl=timedelta(minutes=1),
+    tags=lambda campaign_id: [f"campaign:{campaign_id}"]
+)
 async def get_campaign_metrics(campaign_id: str) -> dict:
     # Expensive computation here
     pass
+
+@cached_many("campaign_metrics_batch", expire=timedelta(minutes=5), ids_arg="campaign_ids")
+async def get_campaigns_metrics(campaign_ids: List[str]) -> Dict[str, dict]:
+    # One backend query for all campaigns that weren't cached
+    pass
+
+async def on_campaign_updated(campaign_id: str):
+    await cache_manager.invalidate_tags(f"campaign:{campaign_id}")
+
+# app/main.py
+@app.on_event("startup")
+async def start_cache_invalidation_listener():
+    app.state.cache_listener = asyncio.create_task(
+        cache_manager.listen_for_invalidations()
+    )
+
+@app.on_event("shutdown")
+async def stop_cache_invalidation_listener():
+    app.state.cache_listener.cancel()
 ```
 
 # 3. Advanced Analytics and Aggregation System
 
 ```python
-# app/services/analytics.py
-from typing import List, Dict, Optional
+# app/services/sketches.py
+import hashlib
+import math
+import random
+from typing import Dict, List, Optional
+
+class TDigest:
+    """Mergeable quantile sketch (merging t-digest)"""
+
+    def __init__(self, compression: int = 100):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self._buffer: List[float] = []
+
+    @property
+    def count(self) -> float:
+        return sum(self.weights) + len(self._buffer)
+
+    def add(self, value: float):
+        self._buffer.append(float(value))
+        if len(self._buffer) >= self.compression * 5:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        other._compress()
+        self._compress(list(zip(other.means, other.weights)))
+        return self
+
+    def _compress(self, extra: Optional[List[tuple]] = None):
+        points = sorted([
+            *zip(self.means, self.weights),
+            *((value, 1.0) for value in self._buffer),
+            *(extra or [])
+        ])
+        self._buffer = []
+        if not points:
+            return
+        total = sum(weight for _, weight in points)
+        means, weights = [points[0][0]], [points[0][1]]
+        weight_before = 0.0
+        for mean, weight in points[1:]:
+            proposed = weights[-1] + weight
+            q = (weight_before + proposed / 2) / total
+            # Centroids near the tails stay small so extreme quantiles stay accurate
+            if proposed <= max(1.0, 4 * total * q * (1 - q) / self.compression):
+                means[-1] += (mean - means[-1]) * weight / proposed
+                weights[-1] = proposed
+            else:
+                weight_before += weights[-1]
+                means.append(mean)
+                weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        self._compress()
+        if not self.means:
+            return None
+        rank = q * sum(self.weights)
+        cumulative = 0.0
+        previous_center, previous_mean = None, None
+        for mean, weight in zip(self.means, self.weights):
+            center = cumulative + weight / 2
+            if rank <= center:
+                if previous_center is None:
+                    return mean
+                fraction = (rank - previous_center) / (center - previous_center)
+                return previous_mean + (mean - previous_mean) * fraction
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+        return self.means[-1]
+
+    def to_dict(self) -> Dict:
+        self._compress()
+        return {'means': self.means, 'weights': self.weights}
+
+    @classmethod
+    def from_dict(cls, data: Dict, compression: int = 100) -> "TDigest":
+        digest = cls(compression)
+        digest.means = list(data.get('means', []))
+        digest.weights = list(data.get('weights', []))
+        return digest
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch; p=12 gives roughly 1.6% error"""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.registers = bytearray(1 << p)
+
+    def add(self, value: str):
+        hashed = int.from_bytes(hashlib.sha1(str(value).encode()).digest()[:8], 'big')
+        index = hashed >> (64 - self.p)
+        remaining = hashed & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while most registers are empty
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_dict(self) -> Dict:
+        return {'registers': bytes(self.registers)}
+
+    @classmethod
+    def from_dict(cls, data: Dict, p: int = 12) -> "HyperLogLog":
+        hll = cls(p)
+        if data.get('registers'):
+            hll.registers = bytearray(data['registers'])
+        return hll
+
+class Reservoir:
+    """Fixed-size uniform sample of a stream, mergeable by stream size"""
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self.items: List[float] = []
+        self.seen = 0
+
+    def add(self, value: float):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(value)
+        else:
+            slot = random.randrange(self.seen)
+            if slot < self.size:
+                self.items[slot] = value
+
+    def merge(self, other: "Reservoir") -> "Reservoir":
+        ours, theirs = random.sample(self.items, len(self.items)), random.sample(other.items, len(other.items))
+        share = self.seen / (self.seen + other.seen) if self.seen + other.seen else 0
+        merged = []
+        # Draw from each side in proportion to how much of the stream it saw
+        while len(merged) < self.size and (ours or theirs):
+            take_ours = ours and (not theirs or random.random() < share)
+            merged.append((ours if take_ours else theirs).pop())
+        self.items = merged
+        self.seen += other.seen
+        return self
+
+    def to_dict(self) -> Dict:
+        return {'items': self.items, 'seen': self.seen}
+
+    @classmethod
+    def from_dict(cls, data: Dict, size: int = 200) -> "Reservoir":
+        reservoir = cls(size)
+        reservoir.items = list(data.get('items', []))
+        reservoir.seen = data.get('seen', 0)
+        return reservoir
+
+class CallSketch:
+    """Approximate summary of the calls in one time bucket"""
+
+    FIELDS = ('calls', 'duration', 'customers', 'sentiment')
+
+    def __init__(self):
+        self.calls = 0
+        self.duration = TDigest()
+        self.customers = HyperLogLog()
+        self.sentiment = Reservoir()
+
+    def add(self, result: Dict):
+        self.calls += 1
+        if result.get('duration') is not None:
+            self.duration.add(result['duration'])
+        if result.get('customer_id'):
+            self.customers.add(result['customer_id'])
+        if result.get('sentiment') is not None:
+            self.sentiment.add(result['sentiment'])
+
+    def merge(self, other: "CallSketch") -> "CallSketch":
+        self.calls += other.calls
+        self.duration.merge(other.duration)
+        self.customers.merge(other.customers)
+        self.sentiment.merge(other.sentiment)
+        return self
+
+    def summary(self) -> Dict:
+        sample = sorted(self.sentiment.items)
+        return {
+            'total_calls': self.calls,
+            'unique_customers': self.customers.count(),
+            'duration_percentiles': {
+                f"p{round(q * 100)}": self.duration.quantile(q)
+                for q in (0.5, 0.9, 0.99)
+            },
+            'sentiment': {
+                'avg': sum(sample) / len(sample) if sample else None,
+                'p10': sample[int(0.1 * (len(sample) - 1))] if sample else None,
+                'p50': sample[int(0.5 * (len(sample) - 1))] if sample else None,
+                'p90': sample[int(0.9 * (len(sample) - 1))] if sample else None,
+                'sample_size': len(sample)
+            }
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'duration': self.duration.to_dict(),
+            'customers': self.customers.to_dict(),
+            'sentiment': self.sentiment.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CallSketch":
+        sketch = cls()
+        sketch.calls = data.get('calls', 0)
+        sketch.duration = TDigest.from_dict(data.get('duration') or {})
+        sketch.customers = HyperLogLog.from_dict(data.get('customers') or {})
+        sketch.sentiment = Reservoir.from_dict(data.get('sentiment') or {})
+        return sketch
+```
+
+```python
+# app/services/snapshots.py
+import json
+import os
+import shutil
+import uuid
 from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from app.core.config import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+# Call facts kept in the snapshots; the fields AnalyticsService reads
+SNAPSHOT_FIELDS = (
+    'campaign_id',
+    'customer_id',
+    'success',
+    'converted',
+    'duration',
+    'sentiment'
+)
+
+class CallSnapshotStore:
+    """Parquet snapshots of call facts, partitioned by day and campaign
+
+    Each export writes its part files into a staging directory and moves
+    them into their partitions only once all of them are written, so a
+    partition only ever grows by whole exports.
+    """
+
+    def __init__(
+        self,
+        root: str = settings.ANALYTICS_SNAPSHOT_DIR,
+        settle_time: timedelta = timedelta(minutes=5),
+        chunk_size: int = 50000
+    ):
+        self.root = root
+        # Files starting with "_" are skipped when the dataset is read
+        self.state_path = os.path.join(root, '_state.json')
+        self.staging_root = os.path.join(root, '_staging')
+        self.settle_time = settle_time  # newer calls may still be being written
+        self.chunk_size = chunk_size
+
+    def available(self) -> bool:
+        return pa is not None
+
+    def _require_arrow(self):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for analytics snapshots")
+
+    def _partitioning(self):
+        return ds.partitioning(
+            pa.schema([('date', pa.string()), ('campaign_id', pa.string())]),
+            flavor='hive'
+        )
+
+    def watermark(self) -> Optional[datetime]:
+        """Timestamp up to which calls have been exported"""
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path) as f:
+            return datetime.fromisoformat(json.load(f)['watermark'])
+
+    def _save_watermark(self, watermark: datetime):
+        os.makedirs(self.root, exist_ok=True)
+        self._write_json(self.state_path, {'watermark': watermark.isoformat()})
+
+    def _write_json(self, path: str, data: Dict):
+        # Written aside and renamed, so readers never see a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def export(self, calls: Iterable[Dict], watermark: datetime) -> int:
+        """Append calls to the snapshots and advance the watermark
+
+        Nothing becomes visible until every file of the export is written; a
+        failed export leaves no files behind and is retried in full on the
+        next run.
+        """
+        self._require_arrow()
+        run_dir = os.path.join(self.staging_root, uuid.uuid4().hex)
+        exported = 0
+        try:
+            chunk: List[Dict] = []
+            written = 0
+            for call in calls:
+                chunk.append(call)
+                if len(chunk) >= self.chunk_size:
+                    exported += self._write(chunk, run_dir, written)
+                    written += 1
+                    chunk = []
+            if chunk:
+                exported += self._write(chunk, run_dir, written)
+            os.makedirs(run_dir, exist_ok=True)
+            self._write_json(os.path.join(run_dir, '_commit.json'), {'watermark': watermark.isoformat()})
+        except Exception:
+            shutil.rmtree(run_dir, ignore_errors=True)
+            raise
+        self._publish(run_dir)
+        return exported
+
+    def recover(self):
+        """Finish publishing exports that were committed, drop the rest
+
+        Run before reading the watermark for the next export, which this
+        may advance.
+        """
+        if not os.path.isdir(self.staging_root):
+            return
+        for name in os.listdir(self.staging_root):
+            run_dir = os.path.join(self.staging_root, name)
+            if os.path.exists(os.path.join(run_dir, '_commit.json')):
+                self._publish(run_dir)
+            else:
+                shutil.rmtree(run_dir, ignore_errors=True)
+
+    def _publish(self, run_dir: str):
+        """Move a committed export's files into their partitions, then advance the watermark
+
+        Moves that already happened are not repeated, so this can be rerun
+        after a crash part way through.
+        """
+        with open(os.path.join(run_dir, '_commit.json')) as f:
+            watermark = datetime.fromisoformat(json.load(f)['watermark'])
+        for directory, _, files in os.walk(run_dir):
+            partition = os.path.relpath(directory, run_dir)
+            for name in files:
+                if not name.endswith('.parquet'):
+                    continue
+                target = os.path.join(self.root, partition)
+                os.makedirs(target, exist_ok=True)
+                os.replace(os.path.join(directory, name), os.path.join(target, name))
+        self._save_watermark(watermark)
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    def _write(self, calls: List[Dict], run_dir: str, part: int) -> int:
+        table = pa.table({
+            'date': [call['timestamp'].strftime('%Y-%m-%d') for call in calls],
+            'campaign_id': [call.get('campaign_id') or 'default' for call in calls],
+            'customer_id': [call.get('customer_id') for call in calls],
+            'timestamp': pa.array(
+                [call['timestamp'] for call in calls], type=pa.timestamp('us', tz='UTC')
+            ),
+            'success': pa.array([bool(call.get('success')) for call in calls]),
+            'converted': pa.array([bool(call.get('converted')) for call in calls]),
+            'duration': pa.array([call.get('duration') for call in calls], type=pa.float64()),
+            'sentiment': pa.array([call.get('sentiment') for call in calls], type=pa.float64())
+        })
+        ds.write_dataset(
+            table,
+            run_dir,
+            format='parquet',
+            partitioning=self._partitioning(),
+            # The run ID keeps names unique once moved next to earlier exports
+            basename_template=f"part-{os.path.basename(run_dir)}-{part}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        return table.num_rows
+
+    def scan(
+        self,
+        columns: List[str],
+        start_time: datetime,
+        end_time: datetime,
+        campaign_id: Optional[str] = None
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """Yield record batches as NumPy columns, reading only matching partitions
+
+        Timestamps come back as Unix seconds and missing numbers as NaN.
+        """
+        self._require_arrow()
+        if not os.path.isdir(self.root):
+            return
+        dataset = ds.dataset(self.root, format='parquet', partitioning=self._partitioning())
+        timestamp_type = pa.timestamp('us', tz='UTC')
+        condition = (
+            (ds.field('date') >= start_time.strftime('%Y-%m-%d'))
+            & (ds.field('date') <= end_time.strftime('%Y-%m-%d'))
+            & (ds.field('timestamp') >= pa.scalar(start_time, type=timestamp_type))
+            & (ds.field('timestamp') <= pa.scalar(end_time, type=timestamp_type))
+        )
+        if campaign_id:
+            condition &= ds.field('campaign_id') == campaign_id
+        for batch in dataset.to_batches(columns=columns, filter=condition):
+            yield {
+                name: self._to_numpy(name, batch.column(name))
+                for name in columns
+            }
+
+    def _to_numpy(self, name: str, column) -> np.ndarray:
+        if name == 'timestamp':
+            return column.cast(pa.int64()).to_numpy() / 1e6
+        if column.type == pa.bool_():
+            return column.fill_null(False).to_numpy(zero_copy_only=False).astype(np.float64)
+        return column.to_numpy(zero_copy_only=False)
+
+call_snapshots = CallSnapshotStore()
+```
+
+```python
+# app/services/best_hours.py
+import aioredis
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple, Union
+from app.core.config import settings
+
+# For each scope (a campaign, or one segment of a campaign) we keep call and
+# success counts per hour of the week (0 = Monday 00:00 UTC, 167 = Sunday
+# 23:00) for each week, plus running totals over a sliding window of whole
+# weeks. Every recorded call bumps its week and the totals and re-scores its
+# hour in a sorted set ranked by success rate, so reading the best hours is a
+# single ZREVRANGE. Weeks that slide out of the window are subtracted from
+# the totals by the first update that sees them go.
+#
+# The scripts run once per scope and only touch that scope's four keys,
+# all passed in KEYS; their hash tag keeps them in one Redis Cluster slot.
+BEST_HOURS_LUA = """
+local weeks, totals, rates, counts = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local window_weeks, min_calls, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+
+local function rescore(slot)
+    local calls = tonumber(redis.call('HGET', totals, slot .. ':calls') or '0')
+    local successes = tonumber(redis.call('HGET', totals, slot .. ':successes') or '0')
+    if calls >= min_calls then
+        redis.call('ZADD', rates, successes / calls, slot)
+    else
+        redis.call('ZREM', rates, slot)
+    end
+end
+
+local function expire_weeks(newest)
+    for _, week in ipairs(redis.call('ZRANGEBYSCORE', weeks, '-inf', newest - window_weeks)) do
+        -- Week counts are "<week>:<slot>:<calls|successes>" fields of one hash
+        local fields = {}
+        for slot = 0, 167 do
+            fields[#fields + 1] = week .. ':' .. slot .. ':calls'
+            fields[#fields + 1] = week .. ':' .. slot .. ':successes'
+        end
+        local values = redis.call('HMGET', counts, unpack(fields))
+        local slots = {}
+        for i, value in ipairs(values) do
+            if value then
+                local field = string.sub(fields[i], #week + 2)
+                redis.call('HINCRBY', totals, field, -tonumber(value))
+                slots[string.match(field, '^(%d+):')] = true
+            end
+        end
+        redis.call('HDEL', counts, unpack(fields))
+        redis.call('ZREM', weeks, week)
+        for slot in pairs(slots) do
+            rescore(slot)
+        end
+    end
+end
+
+local function record(week, slot, calls, successes)
+    local newest = redis.call('ZREVRANGE', weeks, 0, 0, 'WITHSCORES')[2]
+    newest = math.max(week, tonumber(newest or week))
+    -- Late results for weeks already out of the window are dropped
+    if week <= newest - window_weeks then
+        return
+    end
+    redis.call('ZADD', weeks, week, week)
+    redis.call('HINCRBY', counts, week .. ':' .. slot .. ':calls', calls)
+    redis.call('HINCRBY', totals, slot .. ':calls', calls)
+    if successes > 0 then
+        redis.call('HINCRBY', counts, week .. ':' .. slot .. ':successes', successes)
+        redis.call('HINCRBY', totals, slot .. ':successes', successes)
+    end
+    expire_weeks(newest)
+    rescore(slot)
+end
+
+-- A scope's keys expire together once it stops receiving calls
+local function touch()
+    for _, key in ipairs(KEYS) do
+        redis.call('EXPIRE', key, ttl)
+    end
+end
+"""
+
+RECORD_CALLS_SCRIPT = BEST_HOURS_LUA + """
+local function entry_key(entry_id)
+    local ms, seq = string.match(entry_id, '^(%d+)-(%d+)$')
+    return tonumber(ms), tonumber(seq)
+end
+
+-- Like the rollups, each scope keeps the last results stream entry each
+-- consumer applied, so a redelivered batch isn't counted twice
+local applied_field = 'applied:' .. ARGV[4]
+local applied = redis.call('HGET', totals, applied_field)
+local applied_ms, applied_seq
+if applied then
+    applied_ms, applied_seq = entry_key(applied)
+end
+
+-- The rest of ARGV is (entry ID, week, slot, success) for each call, in stream order
+local last = nil
+for i = 5, #ARGV, 4 do
+    local entry_id = ARGV[i]
+    local ms, seq = entry_key(entry_id)
+    if not applied or ms > applied_ms or (ms == applied_ms and seq > applied_seq) then
+        record(tonumber(ARGV[i + 1]), ARGV[i + 2], 1, tonumber(ARGV[i + 3]))
+        last = entry_id
+    end
+end
+
+if last then
+    redis.call('HSET', totals, applied_field, last)
+    touch()
+end
+"""
+
+# Adds a scope's history from before the rollup cutoff, at most once
+BACKFILL_SCRIPT = BEST_HOURS_LUA + """
+if redis.call('HSETNX', totals, 'backfilled', 1) == 0 then
+    return 0
+end
+-- The rest of ARGV is (week, slot, calls, successes) for each hour with calls
+for i = 4, #ARGV, 4 do
+    record(tonumber(ARGV[i]), ARGV[i + 1], tonumber(ARGV[i + 2]), tonumber(ARGV[i + 3]))
+end
+touch()
+return 1
+"""
+
+WEEK_SECONDS = 7 * 86400
+# The Unix epoch fell on a Thursday; weeks are counted from Monday 1970-01-05
+WEEK_OFFSET = 4 * 86400
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+class BestHoursIndex:
+    """Sliding-window success rate by hour of the week, per campaign and segment"""
+
+    def __init__(self, window_weeks: int = 4, min_calls: int = 20):
+        self.redis = aioredis.from_url(settings.REDIS_URL)
+        self.prefix = "best_hours:"
+        self.window_weeks = window_weeks
+        self.min_calls = min_calls  # hours with fewer calls aren't ranked
+        self.ttl = int(timedelta(weeks=window_weeks + 1).total_seconds())
+        self._record_calls = self.redis.register_script(RECORD_CALLS_SCRIPT)
+        self._backfill = self.redis.register_script(BACKFILL_SCRIPT)
+
+    def _scope(self, campaign_id: Optional[str], segment: Optional[str] = None) -> str:
+        scope = f"campaign:{campaign_id or 'default'}"
+        return f"{scope}:segment:{segment}" if segment else scope
+
+    def _key(self, scope: str, name: str) -> str:
+        # The braces make the scope the cluster hash tag
+        return f"{self.prefix}{{{scope}}}:{name}"
+
+    def _keys(self, scope: str) -> List[str]:
+        return [self._key(scope, name) for name in ('weeks', 'totals', 'rates', 'counts')]
+
+    def hour_of_week(self, timestamp: Union[str, datetime]) -> int:
+        timestamp = self._as_utc(timestamp)
+        return timestamp.weekday() * 24 + timestamp.hour
+
+    def _as_utc(self, timestamp: Union[str, datetime]) -> datetime:
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.astimezone(timezone.utc)
+
+    def _hours(self, result: Dict) -> List[Tuple[str, int, int, int]]:
+        """(scope, week, hour of week, success) for each scope a call counts towards"""
+        timestamp = self._as_utc(result['timestamp'])
+        week = int((timestamp.timestamp() - WEEK_OFFSET) // WEEK_SECONDS)
+        slot = self.hour_of_week(timestamp)
+        success = 1 if result.get('success') else 0
+        scopes = [self._scope(result.get('campaign_id'))]
+        if result.get('segment'):
+            scopes.append(self._scope(result.get('campaign_id'), result['segment']))
+        return [(scope, week, slot, success) for scope in scopes]
+
+    async def record_calls(
+        self,
+        entries: List[Tuple[str, Dict]],
+        consumer: str,
+        since: Optional[datetime] = None
+    ):
+        """Count completed calls towards their campaign's and segment's hours
+
+        `entries` are (stream entry ID, result) pairs read by `consumer`; the
+        IDs make a redelivered batch a no-op. Calls before `since` are left
+        to the backfill.
+        """
+        args_by_scope: Dict[str, List] = {}
+        for entry_id, result in entries:
+            if isinstance(entry_id, bytes):
+                entry_id = entry_id.decode()
+            if since and self._as_utc(result['timestamp']) < since:
+                continue
+            for scope, week, slot, success in self._hours(result):
+                args_by_scope.setdefault(scope, []).extend([entry_id, week, slot, success])
+        if not args_by_scope:
+            return
+        # One script call per scope, pipelined into a single round trip
+        pipe = self.redis.pipeline(transaction=False)
+        for scope, args in args_by_scope.items():
+            await self._record_calls(
+                keys=self._keys(scope),
+                args=[self.window_weeks, self.min_calls, self.ttl, consumer, *args],
+                client=pipe
+            )
+        await pipe.execute()
+
+    def tally(self, hours: Dict[str, Dict[Tuple[int, int], List[int]]], call: Dict):
+        """Add a historical call to `hours`, per scope, week and hour, for `backfill`"""
+        for scope, week, slot, success in self._hours(call):
+            counts = hours.setdefault(scope, {}).setdefault((week, slot), [0, 0])
+            counts[0] += 1
+            counts[1] += success
+
+    async def backfill(self, hours: Dict[str, Dict[Tuple[int, int], List[int]]]) -> int:
+        """Add tallied history to each scope that hasn't had it yet; returns scopes filled"""
+        if not hours:
+            return 0
+        pipe = self.redis.pipeline(transaction=False)
+        for scope, counts in hours.items():
+            args = []
+            for (week, slot), (calls, successes) in counts.items():
+                args.extend([week, slot, calls, successes])
+            await self._backfill(
+                keys=self._keys(scope),
+                args=[self.window_weeks, self.min_calls, self.ttl, *args],
+                client=pipe
+            )
+        return sum(await pipe.execute())
+
+    async def best_hours(
+        self,
+        campaign_id: str,
+        segment: Optional[str] = None,
+        count: int = 3
+    ) -> List[Dict]:
+        """The hours of the week with the highest success rate, best first"""
+        rates = await self.redis.zrevrange(
+            self._key(self._scope(campaign_id, segment), 'rates'),
+            0,
+            count - 1,
+            withscores=True
+        )
+        return [
+            {
+                'hour_of_week': int(slot),
+                'day': DAY_NAMES[int(slot) // 24],
+                'hour': int(slot) % 24,
+                'success_rate': rate * 100
+            }
+            for slot, rate in rates
+        ]
+
+    async def success_rate(
+        self,
+        campaign_id: str,
+        hour_of_week: int,
+        segment: Optional[str] = None
+    ) -> Optional[float]:
+        """Success rate (0-1) for one hour of the week, or None if too few calls"""
+        return await self.redis.zscore(
+            self._key(self._scope(campaign_id, segment), 'rates'), hour_of_week
+        )
+
+best_hours_index = BestHoursIndex()
+```
+
+```python
+# app/services/analytics.py
+from typing import List, Dict, Optional, Tuple, Union, Iterable, Awaitable
+from datetime import datetime, timedelta, timezone
+import asyncio
+import numpy as np
+from firebase_admin import firestore
 from app.db.base import db
+from app.core.cache import cache_manager, cached
+from app.core.logging import logger
+from app.services.best_hours import best_hours_index
+from app.services.sketches import CallSketch
+from app.services.snapshots import call_snapshots, SNAPSHOT_FIELDS
+
+# Rollups keep running totals per campaign and time bucket, so metrics can be
+# read from a handful of bucket documents instead of every call
+ROLLUP_GRANULARITIES = ('hour', 'day')
+BUCKET_WIDTHS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+ROLLUP_COUNTERS = (
+    'total_calls',
+    'successful_calls',
+    'conversions',
+    'total_duration',
+    'total_sentiment',
+    'sentiment_count'
+)
+
+BUCKET_FIELDS = (
+    'total_calls',
+    'successful_calls',
+    'total_duration',
+    'total_sentiment',
+    'sentiment_count'
+)
+
+class BucketAccumulator:
+    """Vectorised running totals per hour/day/week bucket between two times"""
+
+    WIDTHS = {'hour': 3600, 'day': 86400, 'week': 7 * 86400}
+    # The Unix epoch fell on a Thursday; weeks are counted from Monday 1970-01-05
+    OFFSETS = {'hour': 0, 'day': 0, 'week': 4 * 86400}
+
+    def __init__(self, start_date: datetime, end_date: datetime, granularity: str):
+        if granularity not in self.WIDTHS:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        self.granularity = granularity
+        self.width = self.WIDTHS[granularity]
+        self.offset = self.OFFSETS[granularity]
+        self.first = int(self._index(np.array([start_date.timestamp()]))[0])
+        size = int(self._index(np.array([end_date.timestamp()]))[0]) - self.first + 1
+        self.totals = np.zeros((len(BUCKET_FIELDS), size))
+
+    def _index(self, timestamps: np.ndarray) -> np.ndarray:
+        return np.floor((timestamps - self.offset) / self.width).astype(np.int64)
+
+    def add(self, timestamps: np.ndarray, values: Dict[str, np.ndarray]):
+        """Add a chunk of rows; each row is one call or one pre-summed rollup"""
+        indexes = self._index(timestamps) - self.first
+        in_range = (indexes >= 0) & (indexes < self.totals.shape[1])
+        indexes = indexes[in_range]
+        for row, field in enumerate(BUCKET_FIELDS):
+            self.totals[row] += np.bincount(
+                indexes,
+                weights=values[field][in_range],
+                minlength=self.totals.shape[1]
+            )
+
+    def results(self) -> List[Dict]:
+        totals = dict(zip(BUCKET_FIELDS, self.totals))
+        results = []
+        for i in np.flatnonzero(totals['total_calls']):
+            bucket_start = datetime.fromtimestamp(
+                (self.first + i) * self.width + self.offset, tz=timezone.utc
+            )
+            bucket_id = {
+                'year': bucket_start.year,
+                'month': bucket_start.month,
+                'day': bucket_start.day
+            }
+            if self.granularity == 'hour':
+                bucket_id['hour'] = bucket_start.hour
+            if self.granularity == 'week':
+                bucket_id['week'] = bucket_start.isocalendar()[1]
+            results.append({
+                '_id': bucket_id,
+                'total_calls': int(totals['total_calls'][i]),
+                'successful_calls': int(totals['successful_calls'][i]),
+                # Plain floats: orjson, the default cache codec, rejects numpy scalars
+                'avg_duration': float(totals['total_duration'][i] / totals['total_calls'][i]),
+                'avg_sentiment': (
+                    float(totals['total_sentiment'][i] / totals['sentiment_count'][i])
+                    if totals['sentiment_count'][i] else None
+                )
+            })
+        return results
+
+def _entry_key(entry_id: Union[str, bytes]) -> Tuple[int, int]:
+    """Order results stream entry IDs ("<ms>-<seq>") numerically"""
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    ms, seq = entry_id.split("-")
+    return int(ms), int(seq)
+
+def _summarize(results: Iterable[Dict]) -> Tuple[Dict, CallSketch]:
+    """Rollup counters and sketch for a group of calls in the same bucket"""
+    totals = {counter: 0 for counter in ROLLUP_COUNTERS}
+    sketch = CallSketch()
+    for result in results:
+        _add_call(totals, sketch, result)
+    return totals, sketch
+
+def _add_call(totals: Dict, sketch: CallSketch, result: Dict):
+    totals['total_calls'] += 1
+    totals['successful_calls'] += 1 if result.get('success') else 0
+    totals['conversions'] += 1 if result.get('converted') else 0
+    # Unanswered calls have no duration
+    totals['total_duration'] += result.get('duration') or 0
+    if result.get('sentiment') is not None:
+        totals['total_sentiment'] += result['sentiment']
+        totals['sentiment_count'] += 1
+    sketch.add(result)
+
+@firestore.transactional
+def _load_state(transaction, ref, defaults: Dict) -> Dict:
+    """Read a state document, creating it from `defaults` if it doesn't exist"""
+    snapshot = ref.get(transaction=transaction)
+    if snapshot.exists:
+        return snapshot.to_dict()
+    transaction.set(ref, defaults)
+    return defaults
+
+@firestore.transactional
+def _add_backfill(transaction, rollup_ref, sketch_ref, fields: Dict, totals: Dict, sketch: CallSketch):
+    """Add the calls before the cutoff to a bucket that straddles it, at most once"""
+    snapshot = rollup_ref.get(transaction=transaction)
+    if snapshot.exists and snapshot.to_dict().get('backfilled'):
+        return
+    sketch_snapshot = sketch_ref.get(transaction=transaction)
+    # May be retried, so the backfilled sketch is merged into a fresh copy
+    if sketch_snapshot.exists:
+        sketch = CallSketch.from_dict(sketch_snapshot.to_dict()).merge(sketch)
+    transaction.set(rollup_ref, {
+        **fields,
+        **{counter: firestore.Increment(totals[counter]) for counter in ROLLUP_COUNTERS},
+        'backfilled': True
+    }, merge=True)
+    transaction.set(sketch_ref, {**fields, **sketch.to_dict()})
+
+@firestore.transactional
+def _apply_bucket(
+    transaction,
+    rollup_ref,
+    sketch_ref,
+    fields: Dict,
+    entries: List[Tuple[str, Dict]],
+    consumer: str
+):
+    """Fold one bucket's share of a results batch into its rollup and sketch
+
+    The rollup keeps the last stream entry each consumer applied to it. A
+    consumer re-reads its pending entries in order, so anything at or below
+    that mark was already counted and a redelivered batch is skipped.
+    """
+    # May be retried, so everything is recomputed from fresh reads
+    snapshot = rollup_ref.get(transaction=transaction)
+    applied = (
+        (snapshot.to_dict().get('applied_entries') or {}).get(consumer)
+        if snapshot.exists else None
+    )
+    fresh = [
+        (entry_id, result) for entry_id, result in entries
+        if applied is None or _entry_key(entry_id) > _entry_key(applied)
+    ]
+    if not fresh:
+        return
+    sketch_snapshot = sketch_ref.get(transaction=transaction)
+
+    delta, sketch = _summarize(result for _, result in fresh)
+    if sketch_snapshot.exists:
+        sketch = CallSketch.from_dict(sketch_snapshot.to_dict()).merge(sketch)
+
+    transaction.set(rollup_ref, {
+        **fields,
+        **{counter: firestore.Increment(delta[counter]) for counter in ROLLUP_COUNTERS},
+        # Entries arrive in stream order, so the last one is the highest
+        'applied_entries': {consumer: fresh[-1][0]}
+    }, merge=True)
+    transaction.set(sketch_ref, {**fields, **sketch.to_dict()})
 
 class AnalyticsService:
     def __init__(self):
         self.calls_ref = db.collection('calls')
         self.campaigns_ref = db.collection('campaigns')
         self.metrics_ref = db.collection('metrics')
+        self.rollups_ref = db.collection('call_rollups')
+        self.sketches_ref = db.collection('call_sketches')
+        self.state_ref = db.collection('analytics_state').document('rollups')
+        self.batch_limit = 500  # Firestore writes per batch
+        self.backfill_settle = timedelta(minutes=15)  # let calls before the cutoff finish persisting
+        self._rollup_cutoff: Optional[datetime] = None
+        self._rollups_backfilled = False
+        self.chunk_size = 5000  # documents per vectorised accumulation step
+        self.page_size = 1000  # documents per Firestore read
+        self.max_concurrent_reads = 4  # insight inputs fetched at once
+
+    def _bucket_start(self, timestamp: datetime, granularity: str) -> datetime:
+        if granularity == 'hour':
+            return timestamp.replace(minute=0, second=0, microsecond=0)
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _as_datetime(self, value: Union[str, datetime]) -> datetime:
+        timestamp = datetime.fromisoformat(value) if isinstance(value, str) else value
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.astimezone(timezone.utc)
+
+    def _load_rollup_state(self):
+        # The cutoff is fixed the first time rollups start. The live consumer
+        # only sees results from then on, so anything earlier, even earlier
+        # that day, is left to the backfill.
+        state = _load_state(db.transaction(), self.state_ref, {
+            'cutoff': datetime.now(timezone.utc),
+            'backfilled': False
+        })
+        self._rollup_cutoff = self._as_datetime(state['cutoff'])
+        self._rollups_backfilled = state['backfilled']
+
+    async def rollup_cutoff(self) -> datetime:
+        """Calls before this time are rolled up by the backfill, later ones as they complete"""
+        if self._rollup_cutoff is None:
+            await asyncio.to_thread(self._load_rollup_state)
+        return self._rollup_cutoff
+
+    async def rollups_backfilled(self) -> bool:
+        if not self._rollups_backfilled:
+            await asyncio.to_thread(self._load_rollup_state)
+        return self._rollups_backfilled
+
+    async def _resolve_source(self, source: str) -> str:
+        # Until the backfill has run, rollups miss every call before the cutoff
+        if source == 'rollups' and not await self.rollups_backfilled():
+            return 'calls'
+        return source
+
+    async def record_call_results(self, entries: List[Tuple[str, Dict]], consumer: str):
+        """Add completed calls to their campaign's hourly and daily rollups and sketches
+
+        `entries` are (stream entry ID, result) pairs read by `consumer`; the
+        IDs make a redelivered batch a no-op. Calls before the cutoff are
+        left to the backfill.
+        """
+        cutoff = await self.rollup_cutoff()
+        # Group the batch in memory first so each bucket gets a single transaction
+        buckets: Dict[str, Dict] = {}
+        for entry_id, result in entries:
+            if isinstance(entry_id, bytes):
+                entry_id = entry_id.decode()
+            timestamp = self._as_datetime(result['timestamp'])
+            if timestamp < cutoff:
+                continue
+            campaign_id = result.get('campaign_id') or 'default'
+            for granularity in ROLLUP_GRANULARITIES:
+                bucket_start = self._bucket_start(timestamp, granularity)
+                doc_id = f"{campaign_id}_{granularity}_{bucket_start:%Y%m%d%H}"
+                bucket = buckets.setdefault(doc_id, {
+                    'fields': {
+                        'campaign_id': campaign_id,
+                        'granularity': granularity,
+                        'bucket_start': bucket_start
+                    },
+                    'entries': []
+                })
+                bucket['entries'].append((entry_id, result))
+
+        # Counters and sketch commit together, run in a thread as the Firestore client blocks
+        for doc_id, bucket in buckets.items():
+            await asyncio.to_thread(
+                _apply_bucket,
+                db.transaction(),
+                self.rollups_ref.document(doc_id),
+                self.sketches_ref.document(doc_id),
+                bucket['fields'],
+                bucket['entries'],
+                consumer
+            )
+
+    def backfill_rollups(self) -> Tuple[int, Dict]:
+        """Build the rollups and sketches for every call before the cutoff
+
+        Calls are read in time order and each day's buckets are written in
+        full once the scan moves past it. Buckets are overwritten rather than
+        incremented, so an interrupted backfill can simply be run again; the
+        hour and day straddling the cutoff, which also hold live results,
+        are instead added to once.
+        The same scan tallies the best-hours window; returns the number of
+        calls read and that tally.
+        """
+        if self._rollup_cutoff is None:
+            self._load_rollup_state()
+        calls = self._read_calls(
+            ['campaign_id', 'customer_id', 'segment', 'success', 'converted', 'duration', 'sentiment'],
+            end_time=self._rollup_cutoff - timedelta(microseconds=1)
+        )
+        hours_since = self._rollup_cutoff - timedelta(weeks=best_hours_index.window_weeks)
+        hours: Dict = {}
+        buckets: Dict[str, Dict] = {}
+        current_day = None
+        count = 0
+        for call in calls:
+            timestamp = self._as_datetime(call['timestamp'])
+            day = self._bucket_start(timestamp, 'day')
+            if day != current_day:
+                self._write_buckets(buckets)
+                buckets = {}
+                current_day = day
+            campaign_id = call.get('campaign_id') or 'default'
+            for granularity in ROLLUP_GRANULARITIES:
+                bucket_start = self._bucket_start(timestamp, granularity)
+                doc_id = f"{campaign_id}_{granularity}_{bucket_start:%Y%m%d%H}"
+                bucket = buckets.setdefault(doc_id, {
+                    'fields': {
+                        'campaign_id': campaign_id,
+                        'granularity': granularity,
+                        'bucket_start': bucket_start
+                    },
+                    'totals': {counter: 0 for counter in ROLLUP_COUNTERS},
+                    'sketch': CallSketch()
+                })
+                _add_call(bucket['totals'], bucket['sketch'], call)
+            if timestamp >= hours_since:
+                best_hours_index.tally(hours, call)
+            count += 1
+        self._write_buckets(buckets)
+        return count, hours
+
+    def _mark_backfilled(self):
+        self.state_ref.update({'backfilled': True})
+        self._rollups_backfilled = True
+
+    def _write_buckets(self, buckets: Dict[str, Dict]):
+        items = []
+        for doc_id, bucket in buckets.items():
+            fields = bucket['fields']
+            if fields['bucket_start'] + BUCKET_WIDTHS[fields['granularity']] > self._rollup_cutoff:
+                # The live consumer is already adding the calls after the
+                # cutoff to this bucket, so the earlier ones are added to it
+                _add_backfill(
+                    db.transaction(),
+                    self.rollups_ref.document(doc_id),
+                    self.sketches_ref.document(doc_id),
+                    fields,
+                    bucket['totals'],
+                    bucket['sketch']
+                )
+            else:
+                items.append((doc_id, bucket))
+        # Each bucket is two writes: its rollup and its sketch
+        step = self.batch_limit // 2
+        for start in range(0, len(items), step):
+            batch = db.batch()
+            for doc_id, bucket in items[start:start + step]:
+                batch.set(self.rollups_ref.document(doc_id), {**bucket['fields'], **bucket['totals']})
+                batch.set(
+                    self.sketches_ref.document(doc_id),
+                    {**bucket['fields'], **bucket['sketch'].to_dict()}
+                )
+            batch.commit()
+
+    async def run_rollup_backfill(self, interval: int = 300):
+        """Backfill the rollups and best-hours index once, from whichever instance takes the lock"""
+        while not await self.rollups_backfilled():
+            wait = (await self.rollup_cutoff()) + self.backfill_settle - datetime.now(timezone.utc)
+            if wait > timedelta(0):
+                await asyncio.sleep(wait.total_seconds())
+                continue
+            token = await cache_manager.acquire_lock("analytics_backfill", timeout=3600)
+            if token is None:
+                # Another instance is running it
+                await asyncio.sleep(interval)
+                continue
+            try:
+                backfilled, hours = await asyncio.to_thread(self.backfill_rollups)
+                # Each best-hours scope takes its history at most once, so a rerun is safe
+                scopes = await best_hours_index.backfill(hours)
+                await asyncio.to_thread(self._mark_backfilled)
+                logger.info(
+                    f"Backfilled analytics rollups from {backfilled} calls "
+                    f"and best hours for {scopes} scopes"
+                )
+            except Exception as e:
+                logger.error(f"Rollup backfill error: {str(e)}")
+                await asyncio.sleep(interval)
+            finally:
+                await cache_manager.release_lock("analytics_backfill", token)
+
+    def _stream(self, query, fields: List[str], order_field: str) -> Iterable[Dict]:
+        """Yield matching documents one page at a time, fetching only `fields`
+
+        Each page resumes after the last snapshot of the previous one, so
+        memory stays at a single page however many documents match.
+        """
+        query = query.select(fields).order_by(order_field).limit(self.page_size)
+        last_snapshot = None
+        while True:
+            page = query.start_after(last_snapshot) if last_snapshot else query
+            count = 0
+            for snapshot in page.stream():
+                count += 1
+                last_snapshot = snapshot
+                yield snapshot.to_dict()
+            if count < self.page_size:
+                return
+
+    def _bucket_query(
+        self,
+        ref,
+        granularity: str,
+        campaign_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ):
+        query = ref.where('granularity', '==', granularity)
+        if campaign_id:
+            query = query.where('campaign_id', '==', campaign_id)
+        if start_time:
+            query = query.where('bucket_start', '>=', self._bucket_start(start_time, granularity))
+        if end_time:
+            query = query.where('bucket_start', '<=', end_time)
+        return query
+
+    def _read_rollups(
+        self,
+        granularity: str,
+        campaign_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Iterable[Dict]:
+        query = self._bucket_query(self.rollups_ref, granularity, campaign_id, start_time, end_time)
+        return self._stream(query, ['bucket_start', *ROLLUP_COUNTERS], 'bucket_start')
+
+    def _merge_sketches(
+        self,
+        granularity: str,
+        campaign_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> CallSketch:
+        query = self._bucket_query(self.sketches_ref, granularity, campaign_id, start_time, end_time)
+        merged = CallSketch()
+        for sketch in self._stream(query, ['bucket_start', *CallSketch.FIELDS], 'bucket_start'):
+            merged.merge(CallSketch.from_dict(sketch))
+        return merged
+
+    def _read_calls(
+        self,
+        fields: List[str],
+        campaign_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Iterable[Dict]:
+        query = self.calls_ref
+        if campaign_id:
+            query = query.where('campaign_id', '==', campaign_id)
+        if start_time:
+            query = query.where('timestamp', '>=', start_time)
+        if end_time:
+            query = query.where('timestamp', '<=', end_time)
+        return self._stream(query, ['timestamp', *fields], 'timestamp')
 
     async def aggregate_metrics(
         self,
         start_date: datetime,
         end_date: datetime,
-        granularity: str = 'day'
+        granularity: str = 'day',
+        campaign_id: Optional[str] = None,
+        source: str = 'rollups'
     ) -> List[Dict]:
-        """Aggregate metrics for specified time period"""
-        pipeline = [
-            {
-                '$match': {
-                    'timestamp': {
-                        '$gte': start_date,
-                        '$lte': end_date
-                    }
-                }
-            },
-            {
-                '$group': {
-                    '_id': {
-                        'year': {'$year': '$timestamp'},
-                        'month': {'$month': '$timestamp'},
-                        'day': {'$dayOfMonth': '$timestamp'} if granularity == 'day' else None,
-                        'hour': {'$hour': '$timestamp'} if granularity == 'hour' else None
-                    },
-                    'total_calls': {'$sum': 1},
-                    'successful_calls': {
-                        '$sum': {'$cond': ['$success', 1, 0]}
-                    },
-                    'avg_duration': {'$avg': '$duration'},
-                    'avg_sentiment': {'$avg': '$sentiment'},
-                }
-            },
-            {'$sort': {'_id': 1}}
-        ]
-
-        return await self.calls_ref.aggregate(pipeline).to_list(None)
-
+        """Aggregate metrics for specified time period into hour/day/week buckets
+
+        Reads the pre-aggregated rollups by default (the call documents until
+        the rollups are backfilled); `source='calls'` scans the call documents
+        instead, and `source='snapshots'` the local Parquet snapshots (only
+        calls up to the last export).
+        """
+        source = await self._resolve_source(source)
+        start_date = self._as_datetime(start_date)
+        end_date = self._as_datetime(end_date)
+        accumulator = BucketAccumulator(start_date, end_date, granularity)
+
+        if source == 'snapshots':
+            await asyncio.to_thread(
+                self._accumulate_snapshots, accumulator, campaign_id, start_date, end_date
+            )
+            return accumulator.results()
+
+        if source == 'rollups':
+            # Weekly buckets are built from daily rollups
+            rollup_granularity = 'hour' if granularity == 'hour' else 'day'
+            rows = self._read_rollups(rollup_granularity, campaign_id, start_date, end_date)
+            value_of = lambda row, field: row.get(field, 0)
+            time_field = 'bucket_start'
+        else:
+            rows = self._read_calls(
+                ['success', 'duration', 'sentiment'], campaign_id, start_date, end_date
+            )
+            value_of = self._call_field
+            time_field = 'timestamp'
+
+        # The Firestore client blocks, so scan off the event loop
+        await asyncio.to_thread(self._accumulate, accumulator, rows, time_field, value_of)
+
+        return accumulator.results()
+
+    def _call_field(self, call: Dict, field: str) -> float:
+        """A call document's contribution to one of the BUCKET_FIELDS"""
+        if field == 'total_calls':
+            return 1
+        if field == 'successful_calls':
+            return 1 if call.get('success') else 0
+        if field == 'total_duration':
+            return call.get('duration') or 0
+        if field == 'total_sentiment':
+            return call.get('sentiment') or 0
+        return 0 if call.get('sentiment') is None else 1
+
+    def _accumulate(self, accumulator: BucketAccumulator, rows: Iterable[Dict], time_field: str, value_of):
+        """Feed rows into the accumulator in fixed-size chunks to bound memory"""
+        chunk: List[Dict] = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self._add_chunk(accumulator, chunk, time_field, value_of)
+                chunk = []
+        if chunk:
+            self._add_chunk(accumulator, chunk, time_field, value_of)
+
+    def _accumulate_snapshots(
+        self,
+        accumulator: BucketAccumulator,
+        campaign_id: Optional[str],
+        start_date: datetime,
+        end_date: datetime
+    ):
+        columns = ['timestamp', 'success', 'duration', 'sentiment']
+        for batch in call_snapshots.scan(columns, start_date, end_date, campaign_id):
+            has_sentiment = ~np.isnan(batch['sentiment'])
+            accumulator.add(batch['timestamp'], {
+                'total_calls': np.ones(len(batch['timestamp'])),
+                'successful_calls': batch['success'],
+                'total_duration': np.nan_to_num(batch['duration']),
+                'total_sentiment': np.where(has_sentiment, batch['sentiment'], 0),
+                'sentiment_count': has_sentiment.astype(np.float64)
+            })
+
+    def export_snapshot(self) -> int:
+        """Append calls completed since the last export to the Parquet snapshots"""
+        until = datetime.now(timezone.utc) - call_snapshots.settle_time
+        call_snapshots.recover()
+        watermark = call_snapshots.watermark()
+        since = watermark + timedelta(microseconds=1) if watermark else None
+        calls = self._read_calls(list(SNAPSHOT_FIELDS), start_time=since, end_time=until)
+        return call_snapshots.export(calls, until)
+
+    async def run_snapshot_exporter(self, interval: int = 900):
+        """Export snapshots every `interval` seconds from one replica at a time"""
+        while True:
+            # Held for a few intervals so a slow export isn't started twice
+            token = await cache_manager.acquire_lock("snapshot_export", timeout=interval * 4)
+            if token is not None:
+                try:
+                    exported = await asyncio.to_thread(self.export_snapshot)
+                    logger.info(f"Exported {exported} calls to analytics snapshots")
+                except Exception as e:
+                    logger.error(f"Snapshot export error: {str(e)}")
+                finally:
+                    await cache_manager.release_lock("snapshot_export", token)
+            await asyncio.sleep(interval)
+
+    def _add_chunk(self, accumulator: BucketAccumulator, chunk: List[Dict], time_field: str, value_of):
+        timestamps = np.fromiter(
+            (self._as_datetime(row[time_field]).timestamp() for row in chunk),
+            dtype=np.float64,
+            count=len(chunk)
+        )
+        accumulator.add(timestamps, {
+            field: np.fromiter(
+                (value_of(row, field) for row in chunk),
+                dtype=np.float64,
+                count=len(chunk)
+            )
+            for field in BUCKET_FIELDS
+        })
+
+    @cached(
+        "performance_metrics",
+        expire=timedelta(minutes=5),
+        time_bucket=timedelta(minutes=1),
+        tags=lambda campaign_id, **_: [f"campaign:{campaign_id}"] if campaign_id else []
+    )
     async def calculate_performance_metrics(
         self,
         campaign_id: Optional[str] = None,
-        time_range: Optional[timedelta] = None
+        time_range: Optional[timedelta] = None,
+        source: str = 'rollups'
     ) -> Dict:
-        """Calculate detailed performance metrics"""
-        query = self.calls_ref
+        """Calculate detailed performance metrics
 
-        if campaign_id:
-            query = query.where('campaign_id', '==', campaign_id)
-
-        if time_range:
-            start_time = datetime.now() - time_range
-            query = query.where('timestamp', '>=', start_time)
+        Documents are streamed and folded into running totals, so memory
+        does not grow with the campaign.
+        """
+        start_time = datetime.now(timezone.utc) - time_range if time_range else None
+        source = await self._resolve_source(source)
+        totals = await asyncio.to_thread(self._sum_totals, campaign_id, start_time, source)
 
-        calls = await query.get()
-        
-        total_calls = len(calls)
+        total_calls = totals['total_calls']
         if total_calls == 0:
             return {
                 'total_calls': 0,
@@ -259,46 +3086,99 @@ class AnalyticsService:
                 'conversion_rate': 0
             }
 
-        successful_calls = sum(1 for call in calls if call.get('success'))
-        total_duration = sum(call.get('duration', 0) for call in calls)
-        conversions = sum(1 for call in calls if call.get('converted'))
-
         return {
             'total_calls': total_calls,
-            'success_rate': (successful_calls / total_calls) * 100,
-            'avg_duration': total_duration / total_calls,
-            'conversion_rate': (conversions / total_calls) * 100
+            'success_rate': (totals['successful_calls'] / total_calls) * 100,
+            'avg_duration': totals['total_duration'] / total_calls,
+            'conversion_rate': (totals['conversions'] / total_calls) * 100
         }
 
+    @cached("approximate_metrics", expire=timedelta(minutes=5), time_bucket=timedelta(minutes=5))
+    async def approximate_metrics(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        campaign_id: Optional[str] = None
+    ) -> Dict:
+        """Approximate percentiles and distinct counts merged from daily sketches
+
+        Costs one small document per campaign-day instead of a scan of every
+        call; percentiles and unique customers are estimates.
+        """
+        start_date = self._as_datetime(start_date)
+        end_date = self._as_datetime(end_date)
+        if await self.rollups_backfilled():
+            sketch = await asyncio.to_thread(
+                self._merge_sketches, 'day', campaign_id, start_date, end_date
+            )
+        else:
+            # Until the backfill has run, sketches miss every call before the cutoff
+            sketch = await asyncio.to_thread(self._sketch_calls, campaign_id, start_date, end_date)
+        return sketch.summary()
+
+    def _sketch_calls(
+        self,
+        campaign_id: Optional[str],
+        start_time: datetime,
+        end_time: datetime
+    ) -> CallSketch:
+        sketch = CallSketch()
+        for call in self._read_calls(['customer_id', 'duration', 'sentiment'], campaign_id, start_time, end_time):
+            sketch.add(call)
+        return sketch
+
+    def _sum_totals(self, campaign_id: Optional[str], start_time: Optional[datetime], source: str) -> Dict:
+        totals = dict.fromkeys(ROLLUP_COUNTERS, 0)
+        if source == 'rollups':
+            # Hourly buckets when a window is given, daily buckets for all-time totals
+            granularity = 'hour' if start_time else 'day'
+            for bucket in self._read_rollups(granularity, campaign_id, start_time):
+                for counter in ROLLUP_COUNTERS:
+                    totals[counter] += bucket.get(counter, 0)
+        else:
+            for call in self._read_calls(['success', 'duration', 'converted'], campaign_id, start_time):
+                totals['total_calls'] += 1
+                totals['successful_calls'] += 1 if call.get('success') else 0
+                totals['conversions'] += 1 if call.get('converted') else 0
+                totals['total_duration'] += call.get('duration') or 0
+        return totals
+
+    async def _gather_bounded(self, *aws: Awaitable) -> List:
+        """Await all of `aws` concurrently, at most `max_concurrent_reads` at a time"""
+        semaphore = asyncio.Semaphore(self.max_concurrent_reads)
+
+        async def run(aw: Awaitable):
+            async with semaphore:
+                return await aw
+
+        return await asyncio.gather(*(run(aw) for aw in aws))
+
+    @cached(
+        "campaign_insights",
+        expire=timedelta(minutes=10),
+        stale_ttl=timedelta(hours=1),
+        early_refresh=True,
+        tags=lambda campaign_id: [f"campaign:{campaign_id}"]
+    )
     async def generate_insights(self, campaign_id: str) -> Dict:
-        """Generate AI-driven insights from metrics"""
-        metrics = await self.calculate_performance_metrics(campaign_id)
-        hourly_metrics = await self.aggregate_metrics(
-            datetime.now() - timedelta(days=7),
-            datetime.now(),
-            'hour'
+        """Generate AI-driven insights from metrics
+
+        Cached; once expired, the previous insights keep being served while
+        they are regenerated in the background.
+        """
+        # Best hours come ready-ranked from the incrementally maintained index
+        metrics, best_hours = await self._gather_bounded(
+            self.calculate_performance_metrics(campaign_id),
+            best_hours_index.best_hours(campaign_id)
         )
 
-        # Analyze patterns
-        best_hours = sorted(
-            hourly_metrics,
-            key=lambda x: x['successful_calls'] / x['total_calls'] if x['total_calls'] > 0 else 0,
-            reverse=True
-        )[:3]
-
         return {
             'performance_summary': metrics,
-            'best_calling_hours': [
-                {
-                    'hour': h['_id']['hour'],
-                    'success_rate': (h['successful_calls'] / h['total_calls']) * 100
-                }
-                for h in best_hours
-            ],
-            'recommendations': self._generate_recommendations(metrics, hourly_metrics)
+            'best_calling_hours': best_hours,
+            'recommendations': self._generate_recommendations(metrics, best_hours)
         }
 
-    def _generate_recommendations(self, metrics: Dict, hourly_metrics: List[Dict]) -> List[str]:
+    def _generate_recommendations(self, metrics: Dict, best_hours: List[Dict]) -> List[str]:
         """Generate actionable recommendations based on metrics"""
         recommendations = []
 
@@ -312,18 +3192,41 @@ class AnalyticsService:
             recommendations.append("Call duration is above target. Review scripts for optimization")
 
         # Time-based recommendations
-        success_by_hour = {
-            h['_id']['hour']: h['successful_calls'] / h['total_calls']
-            for h in hourly_metrics if h['total_calls'] > 0
-        }
-        best_hours = sorted(success_by_hour.items(), key=lambda x: x[1], reverse=True)[:3]
-        recommendations.append(
-            f"Best performing hours are {', '.join(str(h[0]) for h in best_hours)}"
-        )
+        if best_hours:
+            recommendations.append(
+                "Best performing hours are "
+                + ', '.join(f"{h['day']} {h['hour']:02d}:00 UTC" for h in best_hours)
+            )
 
         return recommendations
 
 analytics_service = AnalyticsService()
+
+# app/main.py
+@app.on_event("startup")
+async def start_rollup_backfill():
+    app.state.rollup_backfill = asyncio.create_task(analytics_service.run_rollup_backfill())
+
+@app.on_event("shutdown")
+async def stop_rollup_backfill():
+    app.state.rollup_backfill.cancel()
+
+@app.on_event("startup")
+async def start_snapshot_exporter():
+    app.state.snapshot_exporter = None
+    if not settings.ANALYTICS_SNAPSHOTS_ENABLED:
+        return
+    if not call_snapshots.available():
+        logger.warning("Analytics snapshots are enabled but pyarrow is not installed")
+        return
+    app.state.snapshot_exporter = asyncio.create_task(
+        analytics_service.run_snapshot_exporter()
+    )
+
+@app.on_event("shutdown")
+async def stop_snapshot_exporter():
+    if app.state.snapshot_exporter:
+        app.state.snapshot_exporter.cancel()
 ```
 
 # 4. Advanced Monitoring System
@@ -336,6 +3239,8 @@ from functools import wraps
 from typing import Callable, Optional
 import psutil
 import asyncio
+from app.core.queue import call_queue
+from app.core.logging import logger
 
 # Metrics
 REQUESTS = Counter(
@@ -360,6 +3265,55 @@ QUEUE_SIZE = Gauge(
     'Number of calls in queue'
 )
 
+SCHEDULED_CALLS = Gauge(
+    'scheduled_calls',
+    'Number of calls waiting for their scheduled time or calling window'
+)
+
+QUEUE_WAIT_TIME = Histogram(
+    'queue_wait_seconds',
+    'Time from a call becoming eligible to a worker claiming it',
+    ['campaign'],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+)
+
+CALL_PROCESSING_TIME = Histogram(
+    'call_processing_seconds',
+    'Time a worker spends processing a call',
+    ['campaign'],
+    buckets=(1, 5, 15, 30, 60, 120, 180, 300, 600, 900)
+)
+
+WORKER_CALLS = Counter(
+    'queue_worker_calls_total',
+    'Calls processed by each queue worker',
+    ['worker', 'status']
+)
+
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total',
+    'Cache lookups by key prefix and result (local_hit, hit, miss)',
+    ['prefix', 'result']
+)
+
+CACHE_LATENCY = Histogram(
+    'cache_operation_seconds',
+    'Cache get/set latency by key prefix',
+    ['prefix', 'operation'],
+    buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+)
+
+CACHE_BYTES = Counter(
+    'cache_bytes_total',
+    'Encoded bytes read from and written to Redis by key prefix',
+    ['prefix', 'operation']
+)
+
+QUEUE_WORKERS = Gauge(
+    'queue_workers',
+    'Number of queue workers in this process'
+)
+
 SYSTEM_CPU = Gauge(
     'system_cpu_usage',
     'System CPU usage'
@@ -377,6 +3331,7 @@ class MonitoringService:
 
     def _setup_background_tasks(self):
         asyncio.create_task(self._collect_system_metrics())
+        asyncio.create_task(self._collect_queue_metrics())
 
     async def _collect_system_metrics(self):
         while True:
@@ -385,6 +3340,18 @@ class MonitoringService:
             SYSTEM_MEMORY.set(memory.percent)
             await asyncio.sleep(15)
 
+    async def _collect_queue_metrics(self):
+        # One pipelined stats read per interval instead of per-call updates
+        while True:
+            try:
+                stats = await call_queue.get_queue_stats()
+                self.update_queue_size(stats["queued"])
+                self.update_active_calls(stats["processing"])
+                SCHEDULED_CALLS.set(stats["scheduled"])
+            except Exception as e:
+                logger.error(f"Queue metrics collection error: {str(e)}")
+            await asyncio.sleep(15)
+
     def track_request(self, method: str, endpoint: str, status: int):
         REQUESTS.labels(method=method, endpoint=endpoint, status=status).inc()
 
@@ -397,6 +3364,28 @@ class MonitoringService:
     def update_queue_size(self, size: int):
         QUEUE_SIZE.set(size)
 
+    def update_queue_workers(self, count: int):
+        QUEUE_WORKERS.set(count)
+
+    def track_queue_wait(self, campaign_id: Optional[str], duration: float):
+        QUEUE_WAIT_TIME.labels(campaign=campaign_id or "default").observe(max(duration, 0))
+
+    def track_call_processing(self, campaign_id: Optional[str], duration: float):
+        CALL_PROCESSING_TIME.labels(campaign=campaign_id or "default").observe(duration)
+
+    def track_worker_call(self, worker_id: str, status: str):
+        WORKER_CALLS.labels(worker=worker_id, status=status).inc()
+
+    def track_cache_lookup(self, prefix: str, result: str, duration: float, size: int = 0):
+        CACHE_LOOKUPS.labels(prefix=prefix, result=result).inc()
+        CACHE_LATENCY.labels(prefix=prefix, operation='get').observe(duration)
+        if size:
+            CACHE_BYTES.labels(prefix=prefix, operation='read').inc(size)
+
+    def track_cache_write(self, prefix: str, duration: float, size: int):
+        CACHE_LATENCY.labels(prefix=prefix, operation='set').observe(duration)
+        CACHE_BYTES.labels(prefix=prefix, operation='write').inc(size)
+
     def monitor_endpoint(self, endpoint: str):
         def decorator(func: Callable):
             @wraps(func)